@@ -230,6 +230,7 @@ def reconnect_wifi(ssid, password, country, hostname=None):
     import math
     import rp2
     import ubinascii
+    import enviro.telemetry as telemetry
 
     start_ms = time.ticks_ms()
 
@@ -269,11 +270,16 @@ def reconnect_wifi(ssid, password, country, hostname=None):
         )
         return status
 
+    # when each status was first seen while connecting, for network telemetry
+    first_seen = {}
+
     # Return True on expected status, exception on error status (negative) and False on timeout
     def wait_status(expected_status, *, timeout=10, tick_sleep=0.5):
         for i in range(math.ceil(timeout / tick_sleep)):
             time.sleep(tick_sleep)
             status = dump_status()
+            if status not in first_seen:
+                first_seen[status] = time.ticks_ms()
             if status == expected_status:
                 return True
             if status < 0:
@@ -302,6 +308,8 @@ def reconnect_wifi(ssid, password, country, hostname=None):
 
     # Connect to our AP
     logging.info(f"> Connecting to SSID {ssid} (password: {password})...")
+    first_seen.clear()
+    connect_ms = time.ticks_ms()
     wlan.connect(ssid, password)
     try:
         wait_status(CYW43_LINK_UP)
@@ -309,6 +317,13 @@ def reconnect_wifi(ssid, password, country, hostname=None):
         raise Exception(f"Failed to connect to SSID {ssid} (password: {password}): {x}")
     logging.info("> Connected successfully!")
 
+    # split the connection time into joining the network and getting an ip
+    # address (only as accurate as the status polling above)
+    up_ms = first_seen.get(CYW43_LINK_UP, time.ticks_ms())
+    joined_ms = first_seen.get(CYW43_LINK_JOIN, first_seen.get(CYW43_LINK_NOIP, up_ms))
+    telemetry.record("associate", time.ticks_diff(joined_ms, connect_ms))
+    telemetry.record("dhcp", time.ticks_diff(up_ms, joined_ms))
+
     ip, subnet, gateway, dns = wlan.ifconfig()
     logging.info(f"> IP: {ip}, Subnet: {subnet}, Gateway: {gateway}, DNS: {dns}")
 
@@ -319,6 +334,7 @@ def reconnect_wifi(ssid, password, country, hostname=None):
 
 def connect_to_wifi():
     import network
+    import enviro.upload_policy as upload_policy
 
     try:
         wlan = network.WLAN(network.STA_IF)
@@ -335,6 +351,7 @@ def connect_to_wifi():
         seconds_to_connect = elapsed_ms / 1000
         if seconds_to_connect > 5:
             logging.warn("  - took", seconds_to_connect, "seconds to connect to wifi")
+        upload_policy.record_connect(elapsed_ms)
         return True
     except Exception as x:
         logging.error(f"! {x}")
@@ -366,6 +383,31 @@ def low_disk_space():
     return False
 
 
+# make room on a full disk, returns True if any space was freed. readings
+# that only the secondary destination is still waiting for go first (those
+# the primary has already delivered), then the oldest cached readings are
+# merged together
+def downsample_cached_readings():
+    import enviro.journal as journal
+    import enviro.downsample as downsample
+
+    dropped = 0
+    secondary = secondary_destination()
+    if secondary:
+        dropped = journal.drop_oldest(
+            secondary, journal.pending_count(config.destination)
+        )
+        if dropped:
+            journal.commit()
+            logging.warn(
+                f"> dropped {dropped} reading(s) waiting for {secondary} to free disk space"
+            )
+            if not low_disk_space():
+                return True
+
+    return downsample.downsample_cached_readings(low_disk_space) or dropped > 0
+
+
 # returns True if the rtc clock has been set recently
 def is_clock_set():
     # is the year on or before 2020?
@@ -433,10 +475,10 @@ def sync_clock_from_ntp():
     logging.info("  - rtc synched")
 
     # write out the sync time log
-    with open("sync_time.txt", "w") as syncfile:
-        syncfile.write(
-            "{0:04d}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:02d}Z".format(*timestamp)
-        )
+    helpers.write_file_atomic(
+        "sync_time.txt",
+        "{0:04d}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:02d}Z".format(*timestamp),
+    )
 
     return True
 
@@ -513,8 +555,7 @@ def get_sensor_readings():
     # readings["voltage"] = 0.0 # battery_voltage #Temporarily removed until issue is fixed
 
     # write out the last time log
-    with open("last_time.txt", "w") as timefile:
-        timefile.write(now_str)
+    helpers.write_file_atomic("last_time.txt", now_str)
 
     return readings
 
@@ -532,6 +573,10 @@ def get_qwst_modules_readings():
 
 # save the provided readings into a todays readings data file
 def save_reading(readings):
+    import enviro.derived as derived
+
+    derived.evaluate(readings)
+
     # open todays reading file and save readings
     helpers.mkdir_safe("readings")
     readings_filename = f"readings/{helpers.date_string()}.csv"
@@ -548,9 +593,23 @@ def save_reading(readings):
         f.write(",".join(row) + "\r\n")
 
 
-# save the provided readings into a cache file for future uploading
+# add the provided readings to the hourly and daily rollup archive
+def archive_reading(readings):
+    if not config.rollup_archive:
+        return
+
+    import enviro.archive as archive
+    import enviro.derived as derived
+
+    # on a copy so that derived readings don't end up in the upload cache
+    archive.add(derived.evaluate(dict(readings)))
+
+
+# save the provided readings into the upload journal for future uploading
 def cache_upload(readings):
     import network
+    import enviro.journal as journal
+    import enviro.upload_policy as upload_policy
 
     # Get Wi-Fi signal strength (RSSI)
     wlan = network.WLAN(network.STA_IF)
@@ -561,6 +620,8 @@ def cache_upload(readings):
         except Exception as e:
             wifi_strength = None
 
+    upload_policy.record_reading(wifi_strength, readings.get("battery_percent"))
+
     payload = {
         "nickname": config.nickname,
         "timestamp": helpers.datetime_string(),
@@ -568,83 +629,192 @@ def cache_upload(readings):
         "model": model,
         "uid": helpers.uid(),
         "wifi": wifi_strength,
+        "seq": journal.next_sequence(),
     }
 
-    uploads_filename = f"uploads/{helpers.datetime_file_string()}.json"
-    helpers.mkdir_safe("uploads")
-    with open(uploads_filename, "w") as upload_file:
-        # json.dump(payload, upload_file) # TODO what it was changed to
-        upload_file.write(ujson.dumps(payload))
+    if config.network_telemetry:
+        import enviro.telemetry as telemetry
+
+        network_summary = telemetry.summary()
+        if network_summary:
+            payload["network"] = network_summary
+
+    if config.compact_upload_cache:
+        import enviro.records as records
+
+        journal.append(records.encode(payload))
+    else:
+        journal.append(ujson.dumps(payload))
 
 
-# return the number of cached results waiting to be uploaded
+# return the number of cached results waiting to be uploaded to the primary
+# destination, the secondary catches up whenever the primary uploads
 def cached_upload_count():
+    import enviro.journal as journal
+
     try:
-        return len(os.listdir("uploads"))
+        return journal.pending_count(config.destination)
     except OSError:
         return 0
 
 
+# return the number of cached readings that should trigger an upload
+def upload_threshold():
+    import enviro.upload_policy as upload_policy
+
+    return upload_policy.upload_threshold(vbus_present)
+
+
 # returns True if we have more cached uploads than our config allows
 def is_upload_needed():
-    return cached_upload_count() >= config.upload_frequency
+    return cached_upload_count() >= upload_threshold()
 
 
-# upload cached readings to the configured destination
-def upload_readings():
-    if not connect_to_wifi():
-        logging.error(f"  - cannot upload readings, wifi connection failed")
-        return False
+# destinations that can keep a connection open across many readings expose
+# open_session() / close_session(), in between upload_reading() reuses it
+def open_destination_session(destination_module):
+    if hasattr(destination_module, "open_session"):
+        destination_module.open_session()
 
-    destination = config.destination
-    secondary_destination = config.secondary_destination
-    valid_secondary_destinations = [
-        "http",
-        "mqtt",
-        "adafruit_io",
-        "influxdb",
-        "wunderground",
-    ]
-    try:
-        exec(f"import enviro.destinations.{destination}")
-        destination_module = sys.modules[f"enviro.destinations.{destination}"]
 
-        if (
-            secondary_destination in valid_secondary_destinations
-            and secondary_destination != destination
-        ):
-            exec(f"import enviro.destinations.{secondary_destination}")
-            secondary_destination_module = sys.modules[
-                f"enviro.destinations.{secondary_destination}"
-            ]
+def close_destination_session(destination_module):
+    if destination_module is not None and hasattr(destination_module, "close_session"):
+        destination_module.close_session()
+
+
+# destinations that can upload many readings in one request expose
+# batch_size() and upload_batch(), which returns a status per reading
+def destination_batch_size(destination_module):
+    if hasattr(destination_module, "batch_size"):
+        return max(1, destination_module.batch_size())
+    return 1
+
+
+# derived readings the destination uses, destinations without
+# derived_readings() get all of them
+def destination_derived_readings(destination_module):
+    if hasattr(destination_module, "derived_readings"):
+        return destination_module.derived_readings()
+    return None
+
+
+# destinations can also provide upload_reading_async() / upload_batch_async(),
+# non-blocking versions that let both destinations wait on the network at the
+# same time. destinations without them block while they upload
+async def destination_upload_reading(destination_module, reading):
+    if config.concurrent_uploads and hasattr(
+        destination_module, "upload_reading_async"
+    ):
+        return await destination_module.upload_reading_async(reading)
+
+    import uasyncio
+
+    # let the other destination get going before blocking
+    await uasyncio.sleep(0)
+    return destination_module.upload_reading(reading)
+
+
+async def destination_upload_batch(destination_module, readings):
+    if config.concurrent_uploads and hasattr(destination_module, "upload_batch_async"):
+        return await destination_module.upload_batch_async(readings)
+
+    import uasyncio
+
+    await uasyncio.sleep(0)
+    return destination_module.upload_batch(readings)
+
+
+# upload the cached readings that the destination hasn't received yet, each
+# destination keeps its own cursor into the upload journal
+async def upload_to_destination(destination, destination_module):
+    import enviro.journal as journal
+    import enviro.records as records
+    import enviro.upload_budget as upload_budget
+    import enviro.derived as derived
+
+    # upload in the order the readings were cached, in batches for
+    # destinations that support them. with config.upload_order set to
+    # "latest" the newest readings go first so that the latest data shows up
+    # straight away, then the backlog is filled in from the oldest
+    batch_size = destination_batch_size(destination_module)
+    derived_readings = destination_derived_readings(destination_module)
+    latest_first = config.upload_order == "latest"
+
+    def delivered(position):
+        if latest_first:
+            journal.deliver_ahead(position, destination)
+        else:
+            journal.advance(position, destination)
+
+    upload_budget.start(destination)
+    try:
+        while True:
+            if upload_budget.exhausted(destination):
+                logging.info(
+                    f"  - upload budget used up, {journal.pending_count(destination)} reading(s) left for {destination}"
+                )
+                break
 
-        for cache_file in os.ilistdir("uploads"):
             try:
-                with open(f"uploads/{cache_file[0]}", "r") as upload_file:
-                    filename = cache_file[0]
-                    json = ujson.load(upload_file)
-                    destination_module.log_destination()
-                    status = destination_module.upload_reading(json)
-
-                    # Delete if primary upload succeeds regardless of secondary
-                    # Prioritise stability over secondary destination data coverage
-                    # This will mean multiple uploads to secondary if primary fails
-                    # May need to improve destination success management depending on
-                    # destination duplicate handling
-                    if status == UPLOAD_SUCCESS:
-                        logging.info(
-                            f" - Primary destination upload success for {filename}"
+                if latest_first:
+                    entries = journal.read_latest(batch_size, destination)
+                else:
+                    entries = journal.read(batch_size, destination)
+            except OSError:
+                logging.error(f"  ! failed to read cached uploads")
+                return False
+
+            if not entries:
+                if latest_first:
+                    latest_first = False
+                    continue
+                break
+
+            batch = []
+            for position, payload in entries:
+                try:
+                    json = records.decode(payload)
+                except ValueError:
+                    # unreadable entry, nothing can be done with it so skip it
+                    logging.error(f"  ! skipping cached upload as it is corrupt")
+                    json = None
+                upload_budget.spend(destination, len(payload))
+                if json is not None and "readings" in json:
+                    derived.evaluate(json["readings"], derived_readings)
+                batch.append((position, json))
+
+            destination_module.log_destination()
+            statuses = None
+            readings = [json for _, json in batch if json is not None]
+            if batch_size > 1 and readings:
+                statuses = await destination_upload_batch(destination_module, readings)
+
+            index = 0
+            for batch_index, (position, json) in enumerate(batch):
+                if json is None:
+                    delivered(position)
+                    continue
+
+                try:
+                    name = f"reading {json.get('timestamp')}"
+                    if statuses is not None:
+                        status = statuses[index]
+                        index += 1
+                    else:
+                        status = await destination_upload_reading(
+                            destination_module, json
                         )
-                        os.remove(f"uploads/{cache_file[0]}")
-                        logging.info(f" - removing file {cache_file[0]}")
+
+                    if status == UPLOAD_SUCCESS:
+                        logging.info(f" - {destination} upload success for {name}")
+                        delivered(position)
                     elif status == UPLOAD_RATE_LIMITED:
                         # write out that we want to attempt a reupload
                         with open("reattempt_upload.txt", "w") as attemptfile:
                             attemptfile.write("")
 
-                        logging.info(
-                            f"  - cannot upload '{cache_file[0]}' - rate limited"
-                        )
+                        logging.info(f"  - cannot upload '{name}' - rate limited")
+                        journal.commit()
                         sleep(1)
                     elif status == UPLOAD_LOST_SYNC:
                         # remove the sync time file to trigger a resync on next boot
@@ -656,48 +826,172 @@ def upload_readings():
                             attemptfile.write("")
 
                         logging.info(
-                            f"  - cannot upload '{cache_file[0]}' - rtc has become out of sync"
+                            f"  - cannot upload '{name}' - rtc has become out of sync"
                         )
+                        journal.commit()
                         sleep(1)
                     elif status == UPLOAD_SKIP_FILE:
                         logging.error(
-                            f"  ! cannot upload '{cache_file[0]}' to {destination}. Skipping file"
+                            f"  ! cannot upload '{name}' to {destination}. Skipping reading"
                         )
                         warn_led(WARN_LED_BLINK)
+                        delivered(position)
                         continue
                     else:
-                        logging.error(
-                            f"  ! failed to upload '{cache_file[0]}' to {destination}"
-                        )
+                        logging.error(f"  ! failed to upload '{name}' to {destination}")
+                        if statuses is not None:
+                            # readings later in the batch may still have been
+                            # accepted, don't send those again
+                            later = [
+                                p for p, j in batch[batch_index + 1 :] if j is not None
+                            ]
+                            for later_position, later_status in zip(
+                                later, statuses[index:]
+                            ):
+                                if later_status == UPLOAD_SUCCESS:
+                                    journal.deliver_ahead(later_position, destination)
                         return False
 
-                    if (
-                        secondary_destination in valid_secondary_destinations
-                        and secondary_destination != destination
-                    ):
-                        secondary_destination_module.log_destination()
-                        secondary_status = secondary_destination_module.upload_reading(
-                            json
-                        )
-                        if secondary_status == UPLOAD_SUCCESS:
-                            logging.info(
-                                f"  - Secondary destination upload success for {filename}"
-                            )
+                except KeyError:
+                    logging.error(
+                        f"  ! skipping '{name}' as it is missing data. It was likely created by an older version of the enviro firmware"
+                    )
+                    delivered(position)
 
-            except OSError:
-                logging.error(f"  ! failed to open '{cache_file[0]}'")
-                return False
+            # persist the read cursor once per batch
+            journal.commit()
+
+            # only the newest batch goes first, then back to the oldest
+            latest_first = False
+
+    finally:
+        # keep hold of whatever has been delivered so far
+        try:
+            journal.commit()
+        except OSError:
+            logging.error(f"  ! failed to save upload journal")
+
+    return True
+
+
+# upload to the primary and (optional) secondary destination, with
+# config.concurrent_uploads enabled both run at the same time so that the time
+# spent waiting on the network overlaps. returns the success of each
+async def upload_to_destinations(
+    destination, destination_module, secondary, secondary_module
+):
+    if secondary_module is None:
+        return await upload_to_destination(destination, destination_module), True
+
+    if config.concurrent_uploads:
+        import uasyncio
+
+        return await uasyncio.gather(
+            upload_to_destination(destination, destination_module),
+            upload_to_destination(secondary, secondary_module),
+        )
+
+    if not await upload_to_destination(destination, destination_module):
+        return False, True
+    return True, await upload_to_destination(secondary, secondary_module)
+
+
+# upload cached readings to the configured destination
+def upload_readings():
+    import enviro.upload_policy as upload_policy
 
-            except KeyError:
-                logging.error(
-                    f"  ! skipping '{cache_file[0]}' as it is missing data. It was likely created by an older version of the enviro firmware"
+    success = upload_cached_readings()
+    upload_policy.record_upload(success)
+    return success
+
+
+# the configured secondary destination, None if there isn't a valid one
+def secondary_destination():
+    valid_secondary_destinations = [
+        "http",
+        "mqtt",
+        "adafruit_io",
+        "influxdb",
+        "wunderground",
+    ]
+    if (
+        config.secondary_destination not in valid_secondary_destinations
+        or config.secondary_destination == config.destination
+    ):
+        return None
+    return config.secondary_destination
+
+
+def upload_cached_readings():
+    import uasyncio
+    import enviro.journal as journal
+    import enviro.telemetry as telemetry
+
+    if not connect_to_wifi():
+        logging.error(f"  - cannot upload readings, wifi connection failed")
+        return False
+
+    destination = config.destination
+    secondary = secondary_destination()
+
+    destination_module = None
+    secondary_destination_module = None
+    try:
+        exec(f"import enviro.destinations.{destination}")
+        destination_module = sys.modules[f"enviro.destinations.{destination}"]
+
+        if secondary:
+            exec(f"import enviro.destinations.{secondary}")
+            secondary_destination_module = sys.modules[
+                f"enviro.destinations.{secondary}"
+            ]
+
+        # cached readings are only reclaimed once every destination has them,
+        # forget about destinations that are no longer configured
+        journal.use_cursors([d for d in (destination, secondary) if d])
+
+        # don't let a failing secondary destination hold on to readings
+        # forever, it skips its oldest once it is too far behind
+        if secondary:
+            dropped = journal.drop_oldest(secondary, config.secondary_max_pending)
+            if dropped:
+                journal.commit()
+                logging.warn(
+                    f"  - {secondary} is {config.secondary_max_pending} reading(s) behind, dropped the oldest {dropped}"
                 )
 
+        # each destination works through the cache at its own pace and only
+        # retries the readings that it hasn't acknowledged yet
+        open_destination_session(destination_module)
+        if secondary_destination_module is not None:
+            open_destination_session(secondary_destination_module)
+
+        started_ms = time.ticks_ms()
+        success, secondary_success = uasyncio.run(
+            upload_to_destinations(
+                destination,
+                destination_module,
+                secondary,
+                secondary_destination_module,
+            )
+        )
+        telemetry.record_since("upload", started_ms)
+        if not success:
+            return False
+
+        if not secondary_success:
+            # the readings stay cached and will be retried next time
+            logging.error(f"  ! secondary destination {secondary} upload failed")
+
     except ImportError:
         logging.error(f"! cannot find destination {destination}")
         return False
 
     finally:
+        # close any destination sessions before dropping the wifi connection
+        close_destination_session(destination_module)
+        close_destination_session(secondary_destination_module)
+
         # Disconnect wifi
         import network
 
@@ -707,6 +1001,8 @@ def upload_readings():
         wlan.disconnect()
         wlan.active(False)
 
+        telemetry.save()
+
     return True
 
 
@@ -764,7 +1060,7 @@ def startup():
             os.remove("reattempt_upload.txt")
             return
 
-        logging.info(f"> {upload_count} cache file(s) still to upload")
+        logging.info(f"> {upload_count} cached reading(s) still to upload")
         if not upload_readings():
             halt("! reading upload failed")
 
@@ -783,6 +1079,12 @@ def sleep(time_override=None):
     else:
         logging.info("> going to sleep")
 
+    # write out what the upload policy has learnt during this wake, there is
+    # nothing to write if it wasn't used
+    upload_policy = sys.modules.get("enviro.upload_policy")
+    if upload_policy is not None:
+        upload_policy.commit()
+
     # make sure the rtc flags are cleared before going back to sleep
     logging.debug("  - clearing and disabling previous alarm")
     rtc.clear_timer_flag()  # TODO this was removed from 0.0.8
@@ -845,6 +1147,10 @@ def sleep(time_override=None):
         if button_pin.value():  # allow button to force reset
             break
 
+    # save anything the board is holding in memory before it is lost
+    if hasattr(board, "flush"):
+        board.flush()
+
     logging.debug("  - reset")
 
     # reset the board
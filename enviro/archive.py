@@ -0,0 +1,201 @@
+import os, time, ustruct
+import enviro.helpers as helpers
+from phew import logging
+
+# rollup archive
+#
+# with config.rollup_archive enabled every numeric reading is added to hourly
+# and daily aggregates (count, min, max and sum) kept in the archive directory
+# so that the recent history can be looked up on the device without scanning
+# csv files. each record is a fixed size:
+#
+#   uint32  period number (seconds since the epoch // period length)
+#   uint16  key id (from KEYS_FILE)
+#   uint16  number of readings
+#   float32 min
+#   float32 max
+#   float64 sum
+#
+# records are kept in period order in files each holding a fixed number of
+# periods (see ARCHIVES), so a period is found by binary search and old history is dropped by
+# deleting whole files. the records of the current period are at the end of
+# the file and are updated in place as readings come in
+#
+# the key ids are only meaningful with KEYS_FILE so it is kept with a backup.
+# if both are lost the ids aren't handed out again (the old records would be
+# read back under the wrong names), nothing more is archived until the
+# archive directory is deleted
+ARCHIVE_DIR = "archive"
+KEYS_FILE = "archive/keys.json"  # with a backup in archive/keys.json.bak
+RECORD = "<IHHffd"
+RECORD_SIZE = 24
+
+# name: (period length in seconds, periods per file, number of files kept)
+ARCHIVES = {
+    "hourly": (3600, 24, 8),  # a file per day, about a week kept
+    "daily": (86400, 32, 12),  # about a year kept
+}
+
+_keys = None
+
+
+def _archive_path(name, number):
+    return f"{ARCHIVE_DIR}/{name}_{number:06d}.bin"
+
+
+def _has_records():
+    try:
+        return any(entry[0].endswith(".bin") for entry in os.ilistdir(ARCHIVE_DIR))
+    except OSError:
+        return False
+
+
+# the key index, or None if it has been lost
+def _load_keys():
+    global _keys
+    if _keys is None:
+        try:
+            _keys = helpers.load_json_with_backup(KEYS_FILE)
+        except OSError:
+            if _has_records():
+                return None
+            _keys = {}
+        except ValueError:
+            return None
+    return _keys
+
+
+def _read(f, index):
+    f.seek(index * RECORD_SIZE)
+    return ustruct.unpack(RECORD, f.read(RECORD_SIZE))
+
+
+# index of the first record in the file at or after period
+def _find(f, count, period):
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if _read(f, middle)[0] < period:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+# remove files that have dropped out of the history
+def _expire(name, number, files_kept):
+    prefix = f"{name}_"
+    for entry in os.ilistdir(ARCHIVE_DIR):
+        filename = entry[0]
+        if filename.startswith(prefix) and filename.endswith(".bin"):
+            try:
+                old = int(filename[len(prefix) : -4])
+            except ValueError:
+                continue
+            if old <= number - files_kept:
+                os.remove(f"{ARCHIVE_DIR}/{filename}")
+
+
+def _add(name, period, values):
+    seconds, per_file, files_kept = ARCHIVES[name]
+    number = period // per_file
+    filename = _archive_path(name, number)
+    new_file = not helpers.file_exists(filename)
+    count = 0 if new_file else helpers.file_size(filename) // RECORD_SIZE
+
+    with open(filename, "wb" if new_file else "r+b") as f:
+        # find the records already written for this period
+        existing = {}
+        index = count - 1
+        while index >= 0:
+            record = _read(f, index)
+            if record[0] != period:
+                break
+            existing[record[1]] = (index, record)
+            index -= 1
+
+        for key_id, value in values:
+            if key_id in existing:
+                index, record = existing[key_id]
+                _, _, n, low, high, total = record
+                record = (
+                    period,
+                    key_id,
+                    n + 1,
+                    min(low, value),
+                    max(high, value),
+                    total + value,
+                )
+            else:
+                index = count
+                count += 1
+                record = (period, key_id, 1, value, value, value)
+            f.seek(index * RECORD_SIZE)
+            f.write(ustruct.pack(RECORD, *record))
+
+    if new_file:
+        _expire(name, number, files_kept)
+
+
+# add the numeric values of a set of readings to the archive
+def add(readings, now=None):
+    if now is None:
+        now = time.time()
+
+    helpers.mkdir_safe(ARCHIVE_DIR)
+    keys = _load_keys()
+    if keys is None:
+        logging.error(
+            f"  ! archive key index is lost, delete the {ARCHIVE_DIR} directory to start a new archive"
+        )
+        return
+
+    new_keys = False
+    values = []
+    for key, value in readings.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if key not in keys:
+            keys[key] = len(keys)
+            new_keys = True
+        values.append((keys[key], value))
+    if new_keys:
+        helpers.save_json_with_backup(KEYS_FILE, keys)
+    if not values:
+        return
+
+    for name, (seconds, per_file, files_kept) in ARCHIVES.items():
+        try:
+            _add(name, now // seconds, values)
+        except OSError as e:
+            logging.error(f"  ! failed to update {name} archive: {e}")
+
+
+# aggregates of a reading between two times (seconds since the epoch) from the
+# "hourly" or "daily" archive, oldest first as a list of:
+#
+#   (start of period, number of readings, min, max, mean)
+def query(name, key, start, end):
+    seconds, per_file, files_kept = ARCHIVES[name]
+    keys = _load_keys()
+    key_id = keys.get(key) if keys is not None else None
+    if key_id is None:
+        return []
+
+    first, last = start // seconds, end // seconds
+    results = []
+    for number in range(first // per_file, last // per_file + 1):
+        filename = _archive_path(name, number)
+        if not helpers.file_exists(filename):
+            continue
+        count = helpers.file_size(filename) // RECORD_SIZE
+        with open(filename, "rb") as f:
+            index = _find(f, count, first)
+            while index < count:
+                period, record_key, n, low, high, total = _read(f, index)
+                if period > last:
+                    break
+                if record_key == key_id:
+                    results.append((period * seconds, n, low, high, total / n))
+                index += 1
+    return results
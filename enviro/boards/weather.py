@@ -1,11 +1,13 @@
-import time, math, os
+import time, math, os, machine, ustruct
+from array import array
 from breakout_bme280 import BreakoutBME280
 from breakout_ltr559 import BreakoutLTR559
-from machine import Pin
-from pimoroni import Analog
-import ujson
+from machine import Pin, ADC
 from enviro import i2c, activity_led, config, constants
 import enviro.helpers as helpers
+import enviro.rolling as rolling
+import enviro.derived as derived
+import lib.fast_wake as fast_wake
 from phew import logging
 
 
@@ -16,29 +18,62 @@ RAIN_MM_PER_TICK = 0.2794
 WIND_CM_RADIUS = 7.0
 WIND_FACTOR = 0.0218
 DAILY_STATS_FILE = "daily_stats.json"
+RAIN_EVENTS_MAX = 190
+# on usb power rain tips are caught by an interrupt and held in RAM, they are
+# saved once there are RAIN_FLUSH_TIPS of them or after RAIN_FLUSH_MS
+RAIN_TIPS_BUFFER = 32
+RAIN_FLUSH_TIPS = 10
+RAIN_FLUSH_MS = 60000
+RAIN_DEBOUNCE_MS = 50
+# rain rate drops to zero once there hasn't been a tip for this long
+RAIN_RATE_TIMEOUT = 900
+# with rolling_stats the min, max and average are over this many buckets
+ROLLING_BUCKET_SECONDS = 3600
+ROLLING_BUCKETS = 24
+# reported wind speed is the mean of the samples taken in the last
+# WIND_MEAN_SECONDS, kept in buckets of WIND_MEAN_BUCKET_SECONDS
+WIND_MEAN_SECONDS = 600
+WIND_MEAN_BUCKET_SECONDS = 60
+# wind vane output voltage for each direction (index * 22.5 degrees)
+WIND_DIRECTION_VOLTAGES = (
+    2.533,
+    1.308,
+    1.487,
+    0.270,
+    0.300,
+    0.212,
+    0.595,
+    0.408,
+    0.926,
+    0.789,
+    2.031,
+    1.932,
+    3.046,
+    2.667,
+    2.859,
+    2.265,
+)
 
 bme280 = BreakoutBME280(i2c, constants.I2C_ADDR_BME280)
 ltr559 = BreakoutLTR559(i2c)
 
-wind_direction_pin = Analog(constants.WIND_DIRECTION_PIN)
+wind_direction_pin = ADC(constants.WIND_DIRECTION_PIN)
 wind_speed_pin = Pin(constants.WIND_SPEED_PIN, Pin.IN, Pin.PULL_UP)
 rain_pin = Pin(constants.RAIN_PIN, Pin.IN, Pin.PULL_DOWN)
-last_rain_trigger = False
 
 
 def startup(reason):
     logging.info(f"> starting weather")
-    global last_rain_trigger
     import wakeup
 
     # check if rain sensor triggered wake
     rain_sensor_trigger = wakeup.get_gpio_state() & (1 << 10)
 
     if rain_sensor_trigger:
-        # read the current rain entries
-        log_rain()
-
-        last_rain_trigger = True
+        # read the current rain entries (unless main.py already saved the tip
+        # through lib/fast_wake.py)
+        if not fast_wake.recorded:
+            log_rain()
 
         # if we were woken by the RTC or a Poke continue with the startup
         return (
@@ -51,47 +86,187 @@ def startup(reason):
 
 
 def check_trigger():
-    global last_rain_trigger
-    rain_sensor_trigger = rain_pin.value()
-
-    if rain_sensor_trigger and not last_rain_trigger:
+    global _rain_flushed_ms
+    if _rain_flushed_ms is None:
+        # first call on usb power, start catching tips
+        _rain_flushed_ms = time.ticks_ms()
+        rain_pin.irq(trigger=Pin.IRQ_RISING, handler=_rain_tip)
+
+    tips = _rain_irq[0]
+    if tips != _rain_irq[2]:
+        _rain_irq[2] = tips
         activity_led(100)
         time.sleep(0.05)
         activity_led(0)
 
-        log_rain()
-
-    last_rain_trigger = rain_sensor_trigger
+    if tips and (
+        tips >= RAIN_FLUSH_TIPS
+        or time.ticks_diff(time.ticks_ms(), _rain_flushed_ms) >= RAIN_FLUSH_MS
+    ):
+        flush()
+
+
+def flush():
+    """Save any rain tips held in RAM, called before the board resets."""
+    global _rain_flushed_ms, _rain_last_tip_ms
+    # take the tips out of the buffer without the interrupt changing it
+    irq_state = machine.disable_irq()
+    count = _rain_irq[0]
+    for i in range(min(count, RAIN_TIPS_BUFFER)):
+        _rain_flush_buffer[i] = _rain_tips[i]
+    _rain_irq[0] = _rain_irq[2] = 0
+    machine.enable_irq(irq_state)
+
+    _rain_flushed_ms = time.ticks_ms()
+    if not count:
+        return
+
+    now = time.time()
+    data = check_new_day()
+    for i in range(count):
+        # any tips that didn't fit in the buffer are counted as happening now
+        tip_ms = _rain_flush_buffer[i] if i < RAIN_TIPS_BUFFER else _rain_flushed_ms
+        interval_ms = None
+        if _rain_last_tip_ms is not None:
+            interval_ms = time.ticks_diff(tip_ms, _rain_last_tip_ms)
+        _rain_last_tip_ms = tip_ms
+        since_ms = time.ticks_diff(_rain_flushed_ms, tip_ms)
+        add_rain_tip(data, now - since_ms // 1000, interval_ms)
+
+    update_daily_stats(data)
+    commit_daily_stats()
+    logging.info(f"> {count} rain tick(s) recorded ({data['rain_total_mm']} mm total)")
 
 
 # ================================================================
 # 🧠 Cached Daily Stats Handling
 # ================================================================
+# daily stats are read from flash once per wake and then changed in RAM, they
+# are only written back by commit_daily_stats() (once at the end of taking a
+# reading, or straight away for a rain tip) and only if anything changed
 _daily_stats_cache = None
+_daily_stats_dirty = False
+# set once tips saved by lib/fast_wake.py have been added, the file they were
+# in is removed when the stats are next written
+_fast_wake_tips_added = False
 
 # ================================================================
 # ☔ Rain Handling
 # ================================================================
+# tips caught by the interrupt: ticks_ms of each (up to RAIN_TIPS_BUFFER),
+# preallocated so the handler doesn't allocate. _rain_irq holds the number of
+# tips, ticks_ms of the last one (for debouncing) and the number already shown
+# on the activity led
+_rain_tips = array("I", [0] * RAIN_TIPS_BUFFER)
+_rain_flush_buffer = array("I", [0] * RAIN_TIPS_BUFFER)
+_rain_irq = array("I", [0, 0, 0])
+_rain_flushed_ms = None
+_rain_last_tip_ms = None
+
+
+def _rain_tip(pin):
+    now = time.ticks_ms()
+    if time.ticks_diff(now, _rain_irq[1]) < RAIN_DEBOUNCE_MS:
+        return
+    _rain_irq[1] = now
+    if _rain_irq[0] < RAIN_TIPS_BUFFER:
+        _rain_tips[_rain_irq[0]] = now
+    _rain_irq[0] += 1
+
+
+def add_rain_tip(data, tip_time, interval_ms=None):
+    """
+    Add one rain bucket tip at epoch tip_time to daily stats, interval_ms is
+    the time since the previous tip if it is known more precisely than the
+    stored epoch seconds.
+    """
+    data["rain_ticks"] += 1
+    data["rain_total_mm"] = round(data["rain_ticks"] * RAIN_MM_PER_TICK, 3)
+
+    events = rain_events(data)
+    if interval_ms is None and len(events):
+        interval_ms = (tip_time - newest_rain_event(data)) * 1000
+    if interval_ms is not None:
+        data["rain_interval_ms"] = interval_ms
+
+    # add the tip time for per-hour computation
+    if len(events) < RAIN_EVENTS_MAX:
+        events.append(tip_time)
+    else:
+        # full, overwrite the oldest tip
+        head = data.get("rain_events_head", 0)
+        events[head] = tip_time
+        data["rain_events_head"] = (head + 1) % len(events)
 
 
 def log_rain():
     """Add one rain bucket tip, store timestamp, and update totals."""
     data = load_daily_stats()
+    add_rain_tip(data, time.time())
+    update_daily_stats(data)
+    commit_daily_stats()
+    logging.info(f"> Rain tick recorded ({data['rain_total_mm']} mm total)")
 
-    data["rain_ticks"] += 1
-    data["rain_total_mm"] = round(data["rain_ticks"] * RAIN_MM_PER_TICK, 3)
 
-    # append timestamp for per-hour computation
-    ts = helpers.datetime_string()
+def rain_events(data):
+    """
+    Rain tip times as a ring of epoch seconds, at most RAIN_EVENTS_MAX long.
+    data["rain_events_head"] is the index of the oldest tip once it is full.
+    """
     events = data.get("rain_events", [])
-    events.append(ts)
-    # keep at most ~190 events (fits < one FS block comfortably)
-    if len(events) > 190:
-        events = events[-190:]
-    data["rain_events"] = events
+    if not isinstance(events, array):
+        # loaded from json (older files hold ISO datetime strings)
+        ring = array("I")
+        for event in events[-RAIN_EVENTS_MAX:]:
+            try:
+                ring.append(
+                    helpers.timestamp(event) if isinstance(event, str) else event
+                )
+            except Exception:
+                pass
+        if len(ring) < len(events):
+            data["rain_events_head"] = 0
+        events = data["rain_events"] = ring
+    return events
 
-    save_daily_stats(data)
-    logging.info(f"> Rain tick recorded ({data['rain_total_mm']} mm total)")
+
+def newest_rain_event(data):
+    events = rain_events(data)
+    if len(events) < RAIN_EVENTS_MAX:
+        return events[-1]
+    return events[data.get("rain_events_head", 0) - 1]
+
+
+def rain_rate(data):
+    """
+    Current rain rate in mm/h from the time between the last two tips, or the
+    time since the last tip if that is longer so that it falls off as the rain
+    stops.
+    """
+    if not len(rain_events(data)) or not data.get("rain_interval_ms"):
+        return 0.0
+    since = time.time() - newest_rain_event(data)
+    if since > RAIN_RATE_TIMEOUT:
+        return 0.0
+    interval = max(data["rain_interval_ms"] / 1000, since)
+    return RAIN_MM_PER_TICK * 3600 / interval
+
+
+def rain_tips_since(data, since):
+    """Number of rain tips at or after the epoch since, by binary search."""
+    events = rain_events(data)
+    count = len(events)
+    head = data.get("rain_events_head", 0) if count == RAIN_EVENTS_MAX else 0
+
+    # find the first tip (oldest first) at or after since
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if events[(head + middle) % count] < since:
+            low = middle + 1
+        else:
+            high = middle
+    return count - low
 
 
 # ================================================================
@@ -99,22 +274,25 @@ def log_rain():
 # ================================================================
 
 
-def wind_speed(sample_time_ms=1000):
-    """Measure current wind speed in m/s."""
-    state = wind_speed_pin.value()
-    ticks = []
-    start = time.ticks_ms()
+# anemometer edges counted by the pin interrupt: count, first and last edge
+# (ticks_ms), preallocated so the handler doesn't allocate
+_wind_edges = array("I", [0, 0, 0])
+_wind_started_ms = None
 
-    while time.ticks_diff(time.ticks_ms(), start) <= sample_time_ms:
-        now = wind_speed_pin.value()
-        if now != state:
-            ticks.append(time.ticks_ms())
-            state = now
 
-    if len(ticks) < 2:
+def _wind_edge(pin):
+    now = time.ticks_ms()
+    if _wind_edges[0] == 0:
+        _wind_edges[1] = now
+    _wind_edges[2] = now
+    _wind_edges[0] += 1
+
+
+def _edges_to_speed(edges, first_ms, last_ms):
+    if edges < 2:
         return 0.0
 
-    avg_tick_ms = (time.ticks_diff(ticks[-1], ticks[0])) / (len(ticks) - 1)
+    avg_tick_ms = (time.ticks_diff(last_ms, first_ms)) / (edges - 1)
     if avg_tick_ms == 0:
         return 0.0
 
@@ -123,17 +301,106 @@ def wind_speed(sample_time_ms=1000):
     return rotation_hz * circumference * WIND_FACTOR
 
 
+def start_wind_speed():
+    """Start counting anemometer edges in the background (wind_speed_irq)."""
+    global _wind_started_ms
+    if not config.wind_speed_irq or _wind_started_ms is not None:
+        return
+    _wind_edges[0] = 0
+    _wind_started_ms = time.ticks_ms()
+    wind_speed_pin.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=_wind_edge)
+
+
+def wind_speed(sample_time_ms=None):
+    """Measure current wind speed in m/s."""
+    global _wind_started_ms
+    if sample_time_ms is None:
+        sample_time_ms = config.wind_speed_sample_ms
+
+    if config.wind_speed_irq:
+        # sleep out whatever is left of the window since start_wind_speed(),
+        # waking to sample the wind direction
+        start_wind_speed()
+        interval = max(1, sample_time_ms // max(1, config.wind_direction_samples))
+        while True:
+            sample_wind_direction()
+            elapsed = time.ticks_diff(time.ticks_ms(), _wind_started_ms)
+            if elapsed >= sample_time_ms:
+                break
+            time.sleep_ms(min(interval, sample_time_ms - elapsed))
+        wind_speed_pin.irq(handler=None)
+        _wind_started_ms = None
+        return _edges_to_speed(_wind_edges[0], _wind_edges[1], _wind_edges[2])
+
+    state = wind_speed_pin.value()
+    edges = 0
+    first = last = start = next_direction = time.ticks_ms()
+    interval = max(1, sample_time_ms // max(1, config.wind_direction_samples))
+
+    while time.ticks_diff(time.ticks_ms(), start) <= sample_time_ms:
+        if time.ticks_diff(time.ticks_ms(), next_direction) >= 0:
+            sample_wind_direction()
+            next_direction = time.ticks_add(next_direction, interval)
+        now = wind_speed_pin.value()
+        if now != state:
+            last = time.ticks_ms()
+            if edges == 0:
+                first = last
+            edges += 1
+            state = now
+
+    return _edges_to_speed(edges, first, last)
+
+
 def update_wind_stats(current_speed):
-    """Update average and max gust in daily stats."""
+    """
+    Update the streaming wind statistics in daily stats:
+      mean, m2   running mean and sum of squared differences of the day's
+                 samples (welford), for the daily average and deviation
+      gust       highest sample of the day, gust_t when it was seen
+    and the samples of the last WIND_MEAN_SECONDS in a rolling window.
+    Returns the wind statistics and the mean of those recent samples.
+    """
     data = load_daily_stats()
-    data["wind_samples"].append(current_speed)
-    if len(data["wind_samples"]) > 50:
-        data["wind_samples"] = data["wind_samples"][-50:]
-    if current_speed > data.get("wind_gust", 0):
-        data["wind_gust"] = round(current_speed, 2)
-    save_daily_stats(data)
-    avg_speed = sum(data["wind_samples"]) / len(data["wind_samples"])
-    return round(avg_speed, 2), data["wind_gust"]
+    # older stats files kept the last 50 samples instead
+    data.pop("wind_samples", None)
+    old_gust = data.pop("wind_gust", 0.0)
+
+    wind = data.get("wind")
+    if not wind:
+        wind = {
+            "n": 0,
+            "mean": 0.0,
+            "m2": 0.0,
+            "gust": old_gust,
+            "gust_t": 0,
+        }
+        data["wind"] = wind
+    # older stats files kept an exponential average instead of the window
+    wind.pop("mean_10m", None)
+    wind.pop("t", None)
+
+    now = time.time()
+    wind["n"] += 1
+    delta = current_speed - wind["mean"]
+    wind["mean"] += delta / wind["n"]
+    wind["m2"] += delta * (current_speed - wind["mean"])
+
+    window = data["rolling"].setdefault("wind_speed", {})
+    rolling.update(
+        window,
+        current_speed,
+        now,
+        WIND_MEAN_BUCKET_SECONDS,
+        WIND_MEAN_SECONDS // WIND_MEAN_BUCKET_SECONDS,
+    )
+
+    if current_speed > wind["gust"]:
+        wind["gust"] = round(current_speed, 2)
+        wind["gust_t"] = now
+
+    update_daily_stats(data)
+    return wind, rolling.result(window)[2]
 
 
 # ================================================================
@@ -189,30 +456,60 @@ def smooth_direction(
     return smoothed, max(0.0, min(1.0, R))
 
 
+def _wind_direction_table():
+    # directions sorted by voltage, with the raw adc (read_u16) value halfway
+    # between each neighbouring pair to classify readings by binary search
+    order = sorted(range(16), key=lambda i: WIND_DIRECTION_VOLTAGES[i])
+    thresholds = array("H")
+    for a, b in zip(order, order[1:]):
+        midpoint = (WIND_DIRECTION_VOLTAGES[a] + WIND_DIRECTION_VOLTAGES[b]) / 2
+        thresholds.append(int(midpoint * 65535 / 3.3))
+    # unit vector for each direction, in the same order
+    vectors_x = array("f", (helpers.deg_to_vec(i * 22.5)[0] for i in order))
+    vectors_y = array("f", (helpers.deg_to_vec(i * 22.5)[1] for i in order))
+    return thresholds, vectors_x, vectors_y
+
+
+_wind_direction_thresholds, _wind_direction_x, _wind_direction_y = (
+    _wind_direction_table()
+)
+
+# sum of the direction vectors sampled so far and how many there were
+_wind_direction_sum = array("f", [0.0, 0.0])
+_wind_direction_samples = 0
+
+
+def sample_wind_direction():
+    """Read the wind vane once and add its direction to the running sum."""
+    global _wind_direction_samples
+    value = wind_direction_pin.read_u16()
+
+    low, high = 0, len(_wind_direction_thresholds)
+    while low < high:
+        middle = (low + high) // 2
+        if value > _wind_direction_thresholds[middle]:
+            low = middle + 1
+        else:
+            high = middle
+
+    _wind_direction_sum[0] += _wind_direction_x[low]
+    _wind_direction_sum[1] += _wind_direction_y[low]
+    _wind_direction_samples += 1
+
+
 def wind_direction():
-    ADC_TO_DEGREES = (
-        2.533,
-        1.308,
-        1.487,
-        0.270,
-        0.300,
-        0.212,
-        0.595,
-        0.408,
-        0.926,
-        0.789,
-        2.031,
-        1.932,
-        3.046,
-        2.667,
-        2.859,
-        2.265,
-    )
+    """
+    Vector mean of the wind vane samples taken during wind_speed() (topped up
+    to wind_direction_samples if there are fewer) in degrees.
+    """
+    global _wind_direction_samples
+    while _wind_direction_samples < config.wind_direction_samples:
+        sample_wind_direction()
 
-    value = wind_direction_pin.read_voltage()
-    closest_index = min(range(16), key=lambda i: abs(ADC_TO_DEGREES[i] - value))
-    wind_dir = closest_index * 22.5
-    return (wind_dir + 360 + config.wind_direction_offset) % 360
+    wind_dir = helpers.vec_to_deg(_wind_direction_sum[0], _wind_direction_sum[1])
+    _wind_direction_sum[0] = _wind_direction_sum[1] = 0.0
+    _wind_direction_samples = 0
+    return (round(wind_dir, 1) + 360 + config.wind_direction_offset) % 360
 
 
 # ================================================================
@@ -243,29 +540,19 @@ def rainfall(seconds_since_last):
         per_second = round(amount / float(seconds_since_last), 6)
 
     # mm in last 3600s window, using timestamped events
-    per_hour = 0.0
-    events = data.get("rain_events", [])
-    if events:
-        now_ts = helpers.timestamp(helpers.datetime_string())
-        one_hour_ago = now_ts - 3600
-        tips_last_hour = 0
-        for iso in events:
-            try:
-                t = helpers.timestamp(iso)
-                if t >= one_hour_ago:
-                    tips_last_hour += 1
-            except Exception:
-                pass
-        per_hour = round(tips_last_hour * RAIN_MM_PER_TICK, 4)
+    tips_last_hour = rain_tips_since(data, time.time() - 3600)
+    per_hour = round(tips_last_hour * RAIN_MM_PER_TICK, 4)
 
     # total today in mm
     today = round(data.get("rain_total_mm", 0.0), 3)
 
+    rate = rain_rate(data)
+
     # update last_count so next read reports only the new delta
     data["rain_last_count"] = ticks_now
-    save_daily_stats(data)
+    update_daily_stats(data)
 
-    return amount, per_second, per_hour, today
+    return amount, per_second, per_hour, today, rate
 
 
 def estimate_pollen_index(temperature, humidity, wind_speed, rain_today, luminance):
@@ -308,58 +595,147 @@ def estimate_pollen_index(temperature, humidity, wind_speed, rain_today, luminan
     return int(score)
 
 
+def sea_level_pressure(pressure, temperature):
+    if not config.sea_level_pressure:
+        return None
+    return round(
+        helpers.get_sea_level_pressure(
+            pressure, temperature, config.height_above_sea_level
+        ),
+        2,
+    )
+
+
+# worked out from the readings when they are saved or uploaded (see
+# enviro/derived.py)
+derived.register(
+    "dewpoint",
+    ("temperature", "humidity"),
+    lambda temperature, humidity: round(
+        helpers.calculate_dewpoint(temperature, humidity), 2
+    ),
+)
+derived.register(
+    "pollen_index",
+    ("temperature", "humidity", "wind_speed", "rain_today", "luminance"),
+    estimate_pollen_index,
+)
+derived.register("sea_level_pressure", ("pressure", "temperature"), sea_level_pressure)
+
+
 # ================================================================
 # 📊 Unified Daily Statistics System
 # ================================================================
 
 
-def load_daily_stats():
-    global _daily_stats_cache
-    if (
-        _daily_stats_cache is not None
-        and _daily_stats_cache.get("date") == helpers.date_string()
-    ):
-        return _daily_stats_cache
-
-    """Load or create daily statistics JSON file."""
-    today = helpers.date_string()
-    base = {
+def _new_daily_stats(today, previous=None):
+    # rolling windows run across days so are kept from the previous stats
+    rolling_windows = (previous or {}).get("rolling", {})
+    return {
         "date": today,
         "rain_ticks": 0,
         "rain_total_mm": 0.0,
-        "rain_events": [],  # NEW: timestamps (ISO strings) for per-hour calc
+        "rain_events": [],  # NEW: tip times (epoch seconds) for per-hour calc
+        "rain_events_head": 0,  # oldest entry in rain_events once it is full
         "rain_last_count": 0,  # NEW: tick counter at last reading (to get delta)
-        "wind_gust": 0.0,
-        "wind_samples": [],
         "temperature": {"min": 999.0, "max": -999.0, "sum": 0.0, "count": 0},
         "humidity": {"min": 999.0, "max": -999.0, "sum": 0.0, "count": 0},
+        "rolling": rolling_windows,
     }
 
+
+def load_daily_stats():
+    """
+    Load or create daily statistics, read from flash once per wake. The date
+    is only checked when they are read, use check_new_day() to check it again.
+    """
+    global _daily_stats_cache, _daily_stats_dirty
+    if _daily_stats_cache is not None:
+        return _daily_stats_cache
+
+    today = helpers.date_string()
+    base = _new_daily_stats(today)
     if helpers.file_exists(DAILY_STATS_FILE):
         try:
-            with open(DAILY_STATS_FILE, "r") as f:
-                data = ujson.load(f)
+            data = helpers.load_json(DAILY_STATS_FILE)
             if data.get("date") == today:
                 base.update(data)
             else:
                 logging.info("> New day detected — resetting daily stats.")
-                save_daily_stats(base)
+                base = _new_daily_stats(today, data)
+                _daily_stats_dirty = True
         except Exception as e:
             logging.error(f"! Failed to read {DAILY_STATS_FILE}: {e}")
-            save_daily_stats(base)
+            _daily_stats_dirty = True
     else:
-        save_daily_stats(base)
+        _daily_stats_dirty = True
 
     _daily_stats_cache = base
+    add_fast_wake_tips(base)
     return base
 
 
-def save_daily_stats(data):
-    global _daily_stats_cache
-    """Save stats to JSON file."""
+def check_new_day():
+    """
+    Start new daily stats if the day has changed since they were loaded,
+    called once per reading (and per rain flush on USB power). Returns them.
+    """
+    global _daily_stats_cache, _daily_stats_dirty
+    if _daily_stats_cache is None:
+        return load_daily_stats()
+
+    today = helpers.date_string()
+    if _daily_stats_cache.get("date") != today:
+        logging.info("> New day detected — resetting daily stats.")
+        _daily_stats_cache = _new_daily_stats(today, _daily_stats_cache)
+        _daily_stats_dirty = True
+    return _daily_stats_cache
+
+
+def add_fast_wake_tips(data):
+    """Add rain tips saved by lib/fast_wake.py while the board was off."""
+    global _daily_stats_dirty, _fast_wake_tips_added
+    if not helpers.file_exists(fast_wake.RAIN_TIPS_FILE):
+        return
+    with open(fast_wake.RAIN_TIPS_FILE, "rb") as f:
+        tips = f.read()
+
+    # tips from before today belong to stats that have already been reset
+    start_of_day = time.time() // 86400 * 86400
+    count = 0
+    for offset in range(0, len(tips) - 3, 4):
+        tip_time = ustruct.unpack_from("<I", tips, offset)[0]
+        if tip_time >= start_of_day:
+            add_rain_tip(data, tip_time)
+            count += 1
+
+    _daily_stats_dirty = True
+    _fast_wake_tips_added = True
+    logging.info(f"> {count} rain tick(s) recorded while asleep")
+
+
+def update_daily_stats(data):
+    """Replace the stats in RAM, they are written by commit_daily_stats()."""
+    global _daily_stats_cache, _daily_stats_dirty
     _daily_stats_cache = data
-    with open(DAILY_STATS_FILE, "w") as f:
-        ujson.dump(data, f)
+    _daily_stats_dirty = True
+
+
+def commit_daily_stats():
+    """Write the stats to flash if they have changed since the last commit."""
+    global _daily_stats_dirty, _fast_wake_tips_added
+    if not _daily_stats_dirty:
+        return
+    data = _daily_stats_cache
+    if isinstance(data.get("rain_events"), array):
+        data = dict(data)
+        data["rain_events"] = list(data["rain_events"])
+    helpers.save_json(DAILY_STATS_FILE, data)
+    _daily_stats_dirty = False
+
+    if _fast_wake_tips_added:
+        os.remove(fast_wake.RAIN_TIPS_FILE)
+        _fast_wake_tips_added = False
 
 
 def load_dir_state():
@@ -368,14 +744,14 @@ def load_dir_state():
     if not s:
         s = {"ema_x": 0.0, "ema_y": 0.0}
         data["wind_dir_state"] = s
-        save_daily_stats(data)
+        update_daily_stats(data)
     return s
 
 
 def save_dir_state(ema_x, ema_y):
     data = load_daily_stats()
     data["wind_dir_state"] = {"ema_x": ema_x, "ema_y": ema_y}
-    save_daily_stats(data)
+    update_daily_stats(data)
 
 
 # ================================================================
@@ -384,9 +760,15 @@ def save_dir_state(ema_x, ema_y):
 
 
 def update_temp_humidity_stats(temp, hum):
-    """Update daily min, max, and average for temperature and humidity."""
+    """
+    Update daily min, max, and average for temperature and humidity.
+    Returns {key: (min, max, avg)} for today, or for the last 24 hours with
+    rolling_stats.
+    """
     data = load_daily_stats()
+    now = time.time()
 
+    results = {}
     for key, value in [("temperature", temp), ("humidity", hum)]:
         stats = data[key]
         stats["min"] = min(stats["min"], value)
@@ -394,11 +776,15 @@ def update_temp_humidity_stats(temp, hum):
         stats["sum"] += value
         stats["count"] += 1
         data[key] = stats
+        results[key] = (stats["min"], stats["max"], stats["sum"] / stats["count"])
+
+        if config.rolling_stats:
+            window = data["rolling"].setdefault(key, {})
+            rolling.update(window, value, now, ROLLING_BUCKET_SECONDS, ROLLING_BUCKETS)
+            results[key] = rolling.result(window)
 
-    save_daily_stats(data)
-    temp_avg = data["temperature"]["sum"] / data["temperature"]["count"]
-    hum_avg = data["humidity"]["sum"] / data["humidity"]["count"]
-    return round(temp_avg, 2), round(hum_avg, 2)
+    update_daily_stats(data)
+    return results
 
 
 # ================================================================
@@ -407,23 +793,32 @@ def update_temp_humidity_stats(temp, hum):
 
 
 def get_sensor_readings(seconds_since_last, is_usb_power):
+    # with wind_speed_irq the anemometer is counted while the other sensors
+    # are read
+    start_wind_speed()
+    check_new_day()
+
     bme280.read()
     time.sleep(0.1)
     bme280_data = bme280.read()
     ltr_data = ltr559.get_reading()
-    rain, rain_per_second, rain_per_hour, rain_today = rainfall(seconds_since_last)
+    rain, rain_per_second, rain_per_hour, rain_today, rain_rate_now = rainfall(
+        seconds_since_last
+    )
 
     pressure = bme280_data[1] / 100.0
     temperature = bme280_data[0]
     humidity = bme280_data[2]
 
-    avg_temp, avg_hum = update_temp_humidity_stats(temperature, humidity)
+    temp_humidity = update_temp_humidity_stats(temperature, humidity)
+    temp_min, temp_max, temp_avg = temp_humidity["temperature"]
+    hum_min, hum_max = temp_humidity["humidity"][:2]
 
     current_wind = wind_speed()
-    avg_wind, gust_wind = update_wind_stats(current_wind)
+    wind, recent_wind = update_wind_stats(current_wind)
+    avg_wind = round(recent_wind, 2)
     raw_wind_dir = wind_direction()
     smoothed_dir, dir_conf = smooth_direction(raw_wind_dir, avg_wind)
-    daily_stats = load_daily_stats()
 
     from ucollections import OrderedDict
 
@@ -434,7 +829,9 @@ def get_sensor_readings(seconds_since_last, is_usb_power):
             "pressure": round(pressure, 2),
             "luminance": round(ltr_data[BreakoutLTR559.LUX], 2),
             "wind_speed": avg_wind,
-            "wind_gust": gust_wind,
+            "wind_gust": wind["gust"],
+            "wind_speed_avg": round(wind["mean"], 2),
+            "wind_speed_stddev": round(math.sqrt(wind["m2"] / wind["n"]), 2),
             "wind_direction": smoothed_dir,
             "wind_direction_confidence": round(dir_conf, 3),
             # ✅ Rain metrics restored
@@ -442,29 +839,16 @@ def get_sensor_readings(seconds_since_last, is_usb_power):
             "rain_per_second": round(rain_per_second, 6),
             "rain_per_hour": round(rain_per_hour, 4),
             "rain_today": round(rain_today, 3),
-            "dewpoint": round(helpers.calculate_dewpoint(temperature, humidity), 2),
-            "temperature_avg": avg_temp,
-            "temperature_min": round(daily_stats["temperature"]["min"], 2),
-            "temperature_max": round(daily_stats["temperature"]["max"], 2),
-            "humidity_min": round(daily_stats["humidity"]["min"], 2),
-            "humidity_max": round(daily_stats["humidity"]["max"], 2),
-            "pollen_index": estimate_pollen_index(
-                temperature,
-                humidity,
-                avg_wind,
-                rain_today,
-                ltr_data[BreakoutLTR559.LUX],
-            ),
+            "rain_rate": round(rain_rate_now, 2),
+            "temperature_avg": round(temp_avg, 2),
+            "temperature_min": round(temp_min, 2),
+            "temperature_max": round(temp_max, 2),
+            "humidity_min": round(hum_min, 2),
+            "humidity_max": round(hum_max, 2),
         }
     )
 
-    if config.sea_level_pressure:
-        sea_level_pressure = round(
-            helpers.get_sea_level_pressure(
-                pressure, temperature, config.height_above_sea_level
-            ),
-            2,
-        )
-        readings["sea_level_pressure"] = sea_level_pressure
+    # write everything that changed while taking the reading in one go
+    commit_daily_stats()
 
     return readings
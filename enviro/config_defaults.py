@@ -6,6 +6,28 @@ DEFAULT_SECONDARY_DESTINATION = None
 DEFAULT_WIND_DIRECTION_OFFSET = 0
 DEFAULT_UTC_OFFSET = 0
 DEFAULT_UK_BST = True
+DEFAULT_INFLUXDB_BATCH = False
+DEFAULT_COMPACT_UPLOAD_CACHE = True
+DEFAULT_CUSTOM_HTTP_BATCH_SIZE = 1
+DEFAULT_ADAPTIVE_UPLOAD = False
+DEFAULT_UPLOAD_FREQUENCY_MIN = 1
+DEFAULT_UPLOAD_FREQUENCY_MAX = 20
+DEFAULT_CONCURRENT_UPLOADS = False
+DEFAULT_SECONDARY_MAX_PENDING = 500
+DEFAULT_INFLUXDB_BATCH_MAX_BYTES = 4096
+DEFAULT_INFLUXDB_BATCH_SIZE = 10
+DEFAULT_INFLUXDB_SEQ = False
+DEFAULT_GZIP_THRESHOLD = 0
+DEFAULT_NETWORK_TELEMETRY = False
+DEFAULT_UPLOAD_TIME_BUDGET = 0
+DEFAULT_UPLOAD_BYTE_BUDGET = 0
+DEFAULT_UPLOAD_ORDER = "oldest"
+DEFAULT_DOWNSAMPLE_INTERVAL = 60
+DEFAULT_WIND_SPEED_IRQ = False
+DEFAULT_WIND_SPEED_SAMPLE_MS = 1000
+DEFAULT_WIND_DIRECTION_SAMPLES = 1
+DEFAULT_ROLLING_STATS = False
+DEFAULT_ROLLUP_ARCHIVE = False
 
 
 def add_missing_config_settings():
@@ -95,6 +117,151 @@ def add_missing_config_settings():
         config.hass_discovery = False
         config.hass_discovery_triggered = False
 
+    try:
+        config.influxdb_batch
+    except AttributeError:
+        warn_missing_config_setting("influxdb_batch")
+        config.influxdb_batch = DEFAULT_INFLUXDB_BATCH
+
+    try:
+        config.influxdb_batch_max_bytes
+    except AttributeError:
+        warn_missing_config_setting("influxdb_batch_max_bytes")
+        config.influxdb_batch_max_bytes = DEFAULT_INFLUXDB_BATCH_MAX_BYTES
+
+    try:
+        config.influxdb_batch_size
+    except AttributeError:
+        warn_missing_config_setting("influxdb_batch_size")
+        config.influxdb_batch_size = DEFAULT_INFLUXDB_BATCH_SIZE
+
+    try:
+        config.influxdb_seq
+    except AttributeError:
+        warn_missing_config_setting("influxdb_seq")
+        config.influxdb_seq = DEFAULT_INFLUXDB_SEQ
+
+    try:
+        config.compact_upload_cache
+    except AttributeError:
+        warn_missing_config_setting("compact_upload_cache")
+        config.compact_upload_cache = DEFAULT_COMPACT_UPLOAD_CACHE
+
+    try:
+        config.custom_http_batch_size
+    except AttributeError:
+        warn_missing_config_setting("custom_http_batch_size")
+        config.custom_http_batch_size = DEFAULT_CUSTOM_HTTP_BATCH_SIZE
+
+    try:
+        config.adaptive_upload
+    except AttributeError:
+        warn_missing_config_setting("adaptive_upload")
+        config.adaptive_upload = DEFAULT_ADAPTIVE_UPLOAD
+
+    try:
+        config.upload_frequency_min
+    except AttributeError:
+        warn_missing_config_setting("upload_frequency_min")
+        config.upload_frequency_min = DEFAULT_UPLOAD_FREQUENCY_MIN
+
+    try:
+        config.upload_frequency_max
+    except AttributeError:
+        warn_missing_config_setting("upload_frequency_max")
+        config.upload_frequency_max = DEFAULT_UPLOAD_FREQUENCY_MAX
+
+    try:
+        config.concurrent_uploads
+    except AttributeError:
+        warn_missing_config_setting("concurrent_uploads")
+        config.concurrent_uploads = DEFAULT_CONCURRENT_UPLOADS
+
+    try:
+        config.secondary_max_pending
+    except AttributeError:
+        warn_missing_config_setting("secondary_max_pending")
+        config.secondary_max_pending = DEFAULT_SECONDARY_MAX_PENDING
+
+    try:
+        config.custom_http_gzip_threshold
+    except AttributeError:
+        warn_missing_config_setting("custom_http_gzip_threshold")
+        config.custom_http_gzip_threshold = DEFAULT_GZIP_THRESHOLD
+
+    try:
+        config.influxdb_gzip_threshold
+    except AttributeError:
+        warn_missing_config_setting("influxdb_gzip_threshold")
+        config.influxdb_gzip_threshold = DEFAULT_GZIP_THRESHOLD
+
+    try:
+        config.network_telemetry
+    except AttributeError:
+        warn_missing_config_setting("network_telemetry")
+        config.network_telemetry = DEFAULT_NETWORK_TELEMETRY
+
+    try:
+        config.upload_time_budget
+    except AttributeError:
+        warn_missing_config_setting("upload_time_budget")
+        config.upload_time_budget = DEFAULT_UPLOAD_TIME_BUDGET
+
+    try:
+        config.upload_byte_budget
+    except AttributeError:
+        warn_missing_config_setting("upload_byte_budget")
+        config.upload_byte_budget = DEFAULT_UPLOAD_BYTE_BUDGET
+
+    try:
+        config.upload_order
+    except AttributeError:
+        warn_missing_config_setting("upload_order")
+        config.upload_order = DEFAULT_UPLOAD_ORDER
+
+    try:
+        config.downsample_interval
+    except AttributeError:
+        warn_missing_config_setting("downsample_interval")
+        config.downsample_interval = DEFAULT_DOWNSAMPLE_INTERVAL
+
+    try:
+        config.wind_speed_irq
+    except AttributeError:
+        warn_missing_config_setting("wind_speed_irq")
+        config.wind_speed_irq = DEFAULT_WIND_SPEED_IRQ
+
+    try:
+        config.wind_speed_sample_ms
+    except AttributeError:
+        warn_missing_config_setting("wind_speed_sample_ms")
+        config.wind_speed_sample_ms = DEFAULT_WIND_SPEED_SAMPLE_MS
+
+    try:
+        config.wind_direction_samples
+    except AttributeError:
+        warn_missing_config_setting("wind_direction_samples")
+        config.wind_direction_samples = DEFAULT_WIND_DIRECTION_SAMPLES
+
+    # the wind speed sampling interval is divided by this
+    if config.wind_direction_samples < 1:
+        logging.warn(
+            f"> config setting 'wind_direction_samples' must be at least 1, using 1"
+        )
+        config.wind_direction_samples = 1
+
+    try:
+        config.rolling_stats
+    except AttributeError:
+        warn_missing_config_setting("rolling_stats")
+        config.rolling_stats = DEFAULT_ROLLING_STATS
+
+    try:
+        config.rollup_archive
+    except AttributeError:
+        warn_missing_config_setting("rollup_archive")
+        config.rollup_archive = DEFAULT_ROLLUP_ARCHIVE
+
 
 def warn_missing_config_setting(setting):
     logging.warn(f"> config setting '{setting}' missing, please add it to config.py")
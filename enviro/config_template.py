@@ -29,20 +29,65 @@ resync_frequency = 168
 # where to upload to ("http", "mqtt", "adafruit_io", "influxdb", "wunderground")
 destination = None
 # Optional secondary destination - this will consume more battery
-# Cached uploads cleanup occurs only on primary destination success, this means
-# secondary data will not retry if primary is successful, also secondary data
-# will be reuploaded if the primary fails, ensure the secondary destination can
-# handle duplicate uploads
+# Each destination keeps track of which cached readings it has received and
+# only retries the ones it is missing, cached readings are removed once both
+# destinations have them (so a failing secondary destination will cause
+# readings to build up on the device)
 # set to None if not in use
 secondary_destination = None
+# upload to both destinations at the same time rather than one after the
+# other, shortens the time the wifi is on (http and influxdb upload without
+# blocking, the others still block while they upload)
+concurrent_uploads = False
+# most readings kept for the secondary destination while it is failing, the
+# oldest are dropped beyond this so that it can't fill the disk
+secondary_max_pending = 500
 
 # how often to upload data (number of cached readings)
 upload_frequency = 5
 
+# adjust upload_frequency to the conditions (slow or weak wifi, failing uploads
+# and low battery upload less often, usb power uploads every reading), keeping
+# it between upload_frequency_min and upload_frequency_max
+adaptive_upload = False
+upload_frequency_min = 1
+upload_frequency_max = 20
+
+# limit how long (seconds) and how much reading data (bytes) each upload to a
+# destination may take, anything left over is uploaded on the next wake (0 for
+# no limit)
+upload_time_budget = 0
+upload_byte_budget = 0
+# order to upload cached readings in, "oldest" first or "latest" to send the
+# newest readings first and then fill in the older ones
+upload_order = "oldest"
+
+# when the disk is nearly full and uploads are failing, merge the oldest cached
+# readings into one reading per this many minutes (mean, min and max) rather
+# than stopping (0 stops instead)
+downsample_interval = 60
+
+# store cached readings in a compact binary format (False stores them as json)
+compact_upload_cache = True
+
+# keep hourly and daily count, min, max and sum of each reading on the device
+# (in the archive directory, about a week of hourly and a year of daily)
+rollup_archive = False
+
+# time each step of connecting and uploading (wifi, dns, tls, etc.) and add
+# averages over recent uploads to each reading under "network"
+network_telemetry = False
+
 # web hook settings
 custom_http_url = None
 custom_http_username = None
 custom_http_password = None
+# post up to this many readings per request as a json array over a single
+# connection (1 posts each reading on its own)
+custom_http_batch_size = 1
+# gzip request bodies of at least this many bytes (0 never compresses), the
+# server must accept "Content-Encoding: gzip"
+custom_http_gzip_threshold = 0
 
 # mqtt broker settings
 mqtt_broker_address = None
@@ -66,6 +111,19 @@ influxdb_org = None
 influxdb_url = None
 influxdb_token = None
 influxdb_bucket = None
+# add a seq field (the reading's sequence number) to every point so that
+# retried writes can be told apart, always added when batching
+influxdb_seq = False
+# write each reading as a single multi-field line and send many readings per
+# request (note this changes the layout of the data in your bucket)
+influxdb_batch = False
+# number of cached readings read and decoded for each batch (each one takes
+# around a kilobyte of memory while it is being sent)
+influxdb_batch_size = 10
+# largest write request body when batching (in bytes)
+influxdb_batch_max_bytes = 4096
+# gzip write requests of at least this many bytes (0 never compresses)
+influxdb_gzip_threshold = 0
 
 # weather underground settings
 wunderground_id = None
@@ -79,6 +137,17 @@ moisture_target_c = 50
 
 # weather specific settings
 wind_direction_offset = 0
+# how long to measure the wind speed for (in milliseconds)
+wind_speed_sample_ms = 1000
+# count anemometer pulses with a pin interrupt while the other sensors are
+# read rather than polling the pin for the whole sample time
+wind_speed_irq = False
+# read the wind vane this many times while measuring the wind speed and report
+# the average direction
+wind_direction_samples = 1
+# report the temperature and humidity min, max and average over the last 24
+# hours rather than since midnight (utc)
+rolling_stats = False
 
 # compensate for usb power
 usb_power_temperature_offset = 4.5
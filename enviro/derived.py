@@ -0,0 +1,47 @@
+# derived readings
+#
+# readings worked out from other readings (dewpoint from temperature and
+# humidity, etc.) aren't calculated when the sensors are read. instead each
+# is registered with the readings it needs and is only calculated when the
+# reading is saved or uploaded, and then only if something uses it. the
+# result is kept in the readings so it is never calculated twice.
+#
+# derived readings are not stored in the upload cache, they are worked out
+# again from the cached readings when they are uploaded
+
+# name: (names of the readings it is calculated from, function)
+_metrics = {}
+
+
+# register a derived reading, compute is called with the value of each input
+# and returns the value (or None if it can't be calculated)
+def register(name, inputs, compute):
+    _metrics[name] = (inputs, compute)
+
+
+def _value(readings, name):
+    if name in readings:
+        return readings[name]
+    if name not in _metrics:
+        return None
+
+    inputs, compute = _metrics[name]
+    values = []
+    for key in inputs:
+        value = _value(readings, key)
+        if value is None:
+            return None
+        values.append(value)
+
+    value = compute(*values)
+    if value is not None:
+        readings[name] = value
+    return value
+
+
+# add derived readings (all of them, or just those listed in only) to the
+# readings, returns the readings
+def evaluate(readings, only=None):
+    for name in only if only is not None else _metrics:
+        _value(readings, name)
+    return readings
@@ -1,23 +1,77 @@
 from enviro import logging
-from enviro.constants import UPLOAD_SUCCESS, UPLOAD_FAILED
-import urequests
+from enviro.constants import (
+    UPLOAD_SUCCESS,
+    UPLOAD_FAILED,
+    UPLOAD_RATE_LIMITED,
+    UPLOAD_SKIP_FILE,
+)
+import enviro.helpers as helpers
+import urequests, ujson
 import config
 
+# keep-alive connection used for batch uploads, open between open_session()
+# and close_session()
+_connection = None
+
+# connection used by the async uploads, opened on first use and closed by
+# close_session()
+_async_connection = None
+
 
 def log_destination():
     logging.info(f"> uploading cached readings to url: {config.custom_http_url}")
 
 
+def _auth():
+    if config.custom_http_username:
+        return (config.custom_http_username, config.custom_http_password)
+    return None
+
+
+def open_session():
+    global _connection
+    if batch_size() <= 1:
+        return False
+
+    from enviro.httpsimple import HTTPConnection
+
+    try:
+        _connection = HTTPConnection(config.custom_http_url)
+        return True
+    except ValueError as e:
+        logging.error(f"  ! invalid url {config.custom_http_url}: {e}")
+    return False
+
+
+def close_session():
+    global _connection, _async_connection
+    if _connection is not None:
+        _connection.close()
+        _connection = None
+    if _async_connection is not None:
+        _async_connection.close()
+        _async_connection = None
+
+
+# number of cached readings to post in one request, 1 disables batching
+def batch_size():
+    return max(1, config.custom_http_batch_size)
+
+
 def upload_reading(reading):
-    url = config.custom_http_url
+    if batch_size() > 1:
+        return upload_batch([reading])[0]
 
-    auth = None
-    if config.custom_http_username:
-        auth = (config.custom_http_username, config.custom_http_password)
+    url = config.custom_http_url
+    auth = _auth()
 
     try:
         # post reading data to http endpoint
-        result = urequests.post(url, auth=auth, json=reading)
+        body, headers = _body(ujson.dumps(reading))
+        key = helpers.idempotency_key(reading)
+        if key:
+            headers["Idempotency-Key"] = key
+        result = urequests.post(url, auth=auth, data=body, headers=headers)
         result.close()
 
         if result.status_code in [200, 201, 202]:
@@ -28,3 +82,146 @@ def upload_reading(reading):
         logging.debug(f"  - an exception occurred when uploading")
 
     return UPLOAD_FAILED
+
+
+def _item_status(item):
+    # each item is either true/false or an http style status code
+    if item is True:
+        return UPLOAD_SUCCESS
+    if isinstance(item, bool) or not isinstance(item, int):
+        return UPLOAD_FAILED
+    if 200 <= item < 300:
+        return UPLOAD_SUCCESS
+    if item == 429:
+        return UPLOAD_RATE_LIMITED
+    return UPLOAD_FAILED
+
+
+# returns the json body to send, compressed if it is big enough, and the
+# headers that go with it
+def _body(body):
+    body, encoding = helpers.gzip_body(body, config.custom_http_gzip_threshold)
+    headers = {"Content-Type": "application/json"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+# as _body() plus the basic auth header, for requests sent with httpsimple
+def _request_body(readings):
+    body, headers = _body(ujson.dumps(readings))
+    auth = _auth()
+    if auth:
+        import ubinascii
+
+        token = ubinascii.b2a_base64(f"{auth[0]}:{auth[1]}".encode()).decode()
+        headers["Authorization"] = f"Basic {token.strip()}"
+    return body, headers
+
+
+# turns the response to a batch upload into a status per reading
+def _batch_statuses(count, status, reason, response):
+    if status == 429:
+        return [UPLOAD_RATE_LIMITED] * count
+
+    if status not in [200, 201, 202, 207]:
+        logging.debug(f"  - upload issue ({status} {reason})")
+        return [UPLOAD_FAILED] * count
+
+    results = None
+    try:
+        results = ujson.loads(response) if response else None
+        if isinstance(results, dict):
+            results = results.get("results")
+    except ValueError:
+        pass
+
+    if isinstance(results, list) and len(results) == count:
+        return [_item_status(item) for item in results]
+
+    if status == 207:
+        # multi-status without a usable result list, can't tell what was kept
+        logging.debug(f"  - upload issue (207 response without per item results)")
+        return [UPLOAD_FAILED] * count
+
+    return [UPLOAD_SUCCESS] * count
+
+
+# posts the readings as a json array, the endpoint can acknowledge each item
+# individually by replying with a json array (or {"results": [...]}) holding
+# one entry per reading, otherwise the response status applies to all of them
+def upload_batch(readings):
+    count = len(readings)
+
+    try:
+        body, headers = _request_body(readings)
+    except (TypeError, ValueError):
+        logging.error(f"  ! cannot encode readings for upload")
+        return [UPLOAD_SKIP_FILE] * count
+
+    connection = _connection
+    try:
+        if connection is None:
+            from enviro.httpsimple import HTTPConnection
+
+            connection = HTTPConnection(config.custom_http_url)
+
+        status, reason, _, response = connection.request("POST", body, headers)
+    except Exception as e:
+        logging.debug(f"  - an exception occurred when uploading: {e}")
+        return [UPLOAD_FAILED] * count
+    finally:
+        if connection is not None and connection is not _connection:
+            connection.close()
+
+    return _batch_statuses(count, status, reason, response)
+
+
+async def _post_async(body, headers):
+    global _async_connection
+    if _async_connection is None:
+        from enviro.httpsimple import AsyncHTTPConnection
+
+        _async_connection = AsyncHTTPConnection(config.custom_http_url)
+
+    return await _async_connection.request("POST", body, headers)
+
+
+# non-blocking versions of upload_reading() and upload_batch(), used when
+# uploading to more than one destination at the same time
+async def upload_reading_async(reading):
+    if batch_size() > 1:
+        return (await upload_batch_async([reading]))[0]
+
+    try:
+        body, headers = _request_body(reading)
+        key = helpers.idempotency_key(reading)
+        if key:
+            headers["Idempotency-Key"] = key
+        status, reason, _, _ = await _post_async(body, headers)
+        if status in [200, 201, 202]:
+            return UPLOAD_SUCCESS
+
+        logging.debug(f"  - upload issue ({status} {reason})")
+    except Exception as e:
+        logging.debug(f"  - an exception occurred when uploading: {e}")
+
+    return UPLOAD_FAILED
+
+
+async def upload_batch_async(readings):
+    count = len(readings)
+
+    try:
+        body, headers = _request_body(readings)
+    except (TypeError, ValueError):
+        logging.error(f"  ! cannot encode readings for upload")
+        return [UPLOAD_SKIP_FILE] * count
+
+    try:
+        status, reason, _, response = await _post_async(body, headers)
+    except Exception as e:
+        logging.debug(f"  - an exception occurred when uploading: {e}")
+        return [UPLOAD_FAILED] * count
+
+    return _batch_statuses(count, status, reason, response)
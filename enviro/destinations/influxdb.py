@@ -1,8 +1,19 @@
 from enviro import logging
-from enviro.constants import UPLOAD_SUCCESS, UPLOAD_FAILED
-import urequests, time
+from enviro.constants import UPLOAD_SUCCESS, UPLOAD_FAILED, UPLOAD_SKIP_FILE
+import enviro.helpers as helpers
+import urequests
 import config
 
+# measurement used for the one-line-per-reading batch format
+BATCH_MEASUREMENT = "enviro"
+
+# write url and headers, only built once per upload session
+_session = None
+
+# connection used by the async uploads, opened on first use and closed by
+# close_session()
+_async_connection = None
+
 
 def url_encode(t):
     result = ""
@@ -23,38 +34,114 @@ def log_destination():
     )
 
 
-def upload_reading(reading):
-    bucket = config.influxdb_bucket
-
-    payload = ""
-    for key, value in reading["readings"].items():
-        if payload != "":
-            payload += "\n"
-        timestamp = reading["timestamp"]
-
-        year = int(timestamp[0:4])
-        month = int(timestamp[5:7])
-        day = int(timestamp[8:10])
-        hour = int(timestamp[11:13])
-        minute = int(timestamp[14:16])
-        second = int(timestamp[17:19])
-        timestamp = time.mktime((year, month, day, hour, minute, second, 0, 0))
-
-        nickname = reading["nickname"]
-        payload += f"{key},device={nickname} value={value} {timestamp}"
-
+def _build_session():
     influxdb_token = config.influxdb_token
     headers = {"Authorization": f"Token {influxdb_token}"}
 
     url = config.influxdb_url
     org = config.influxdb_org
+    bucket = config.influxdb_bucket
     url += (
         f"/api/v2/write?precision=s&org={url_encode(org)}&bucket={url_encode(bucket)}"
     )
+    return url, headers
+
+
+def _get_session():
+    if _session is not None:
+        return _session
+    return _build_session()
+
+
+def open_session():
+    global _session
+    _session = _build_session()
+    return True
+
+
+def close_session():
+    global _session, _async_connection
+    _session = None
+    if _async_connection is not None:
+        _async_connection.close()
+        _async_connection = None
+
+
+# number of cached readings to pass to upload_batch() (they are all decoded
+# into memory at once), 1 disables batching. the requests themselves are then
+# split by config.influxdb_batch_max_bytes
+def batch_size():
+    return max(1, config.influxdb_batch_size) if config.influxdb_batch else 1
+
+
+# escape a tag value or field key for line protocol
+def _escape(t):
+    return str(t).replace(" ", "\\ ").replace(",", "\\,").replace("=", "\\=")
+
+
+def _field_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return '"' + value.replace('"', '\\"') + '"'
+    return str(value)
+
+
+# one line per reading, all the readings as fields of a single point
+def _batch_line(reading):
+    fields = []
+    for key, value in reading["readings"].items():
+        if value is None:
+            continue
+        fields.append(f"{_escape(key)}={_field_value(value)}")
+
+    if not fields:
+        return None
+
+    # lets retried writes be told apart from new ones
+    if reading.get("seq") is not None:
+        fields.append(f"seq={reading['seq']}i")
+
+    timestamp = helpers.timestamp(reading["timestamp"])
+    nickname = _escape(reading["nickname"])
+    model = _escape(reading["model"])
+    return f"{BATCH_MEASUREMENT},device={nickname},model={model} {','.join(fields)} {timestamp}"
+
+
+# one line per reading value, the original (non batched) payload format
+def _reading_payload(reading):
+    timestamp = helpers.timestamp(reading["timestamp"])
+    nickname = reading["nickname"]
+
+    # lets retried writes be told apart from new ones, off by default so the
+    # points keep their original layout
+    seq = ""
+    if config.influxdb_seq and reading.get("seq") is not None:
+        seq = f",seq={reading['seq']}i"
+
+    lines = []
+    for key, value in reading["readings"].items():
+        lines.append(f"{key},device={nickname} value={value}{seq} {timestamp}")
+    return "\n".join(lines)
+
+
+# returns the write request body, compressed if it is big enough, and the
+# headers that go with it
+def _request(payload):
+    url, headers = _get_session()
+    body, encoding = helpers.gzip_body(payload, config.influxdb_gzip_threshold)
+    if encoding:
+        headers = dict(headers)
+        headers["Content-Encoding"] = encoding
+    return url, body, headers
+
+
+def _post(payload):
+    url, body, headers = _request(payload)
 
     try:
         # post reading data to http endpoint
-        result = urequests.post(url, headers=headers, data=payload)
+        result = urequests.post(url, headers=headers, data=body)
         result.close()
 
         if result.status_code == 204:  # why 204? we'll never know...
@@ -65,3 +152,103 @@ def upload_reading(reading):
         logging.debug(f"  - an exception occurred when uploading")
 
     return UPLOAD_FAILED
+
+
+def upload_reading(reading):
+    if config.influxdb_batch:
+        return upload_batch([reading])[0]
+
+    return _post(_reading_payload(reading))
+
+
+# groups the readings into write requests no bigger than
+# config.influxdb_batch_max_bytes, returns the initial status of each reading
+# and a list of (lines, reading indexes) requests
+def _batch_requests(readings):
+    max_bytes = config.influxdb_batch_max_bytes
+    statuses = [UPLOAD_SKIP_FILE] * len(readings)
+
+    requests = [([], [])]
+    size = 0
+    for index, reading in enumerate(readings):
+        try:
+            line = _batch_line(reading)
+        except (KeyError, ValueError):
+            logging.error(f"  ! skipping reading as it is missing data")
+            continue
+
+        if line is None:
+            # nothing to write for this reading, treat it as delivered
+            statuses[index] = UPLOAD_SUCCESS
+            continue
+
+        lines, indexes = requests[-1]
+        if lines and size + len(line) + 1 > max_bytes:
+            lines, indexes = [], []
+            requests.append((lines, indexes))
+            size = 0
+
+        lines.append(line)
+        indexes.append(index)
+        size += len(line) + 1
+
+    return statuses, requests
+
+
+# uploads many readings with as few write requests as possible, returns the
+# upload status of each reading in the same order they were given
+def upload_batch(readings):
+    statuses, requests = _batch_requests(readings)
+
+    # once a request fails the rest are not attempted so that readings are
+    # always delivered in order
+    status = UPLOAD_SUCCESS
+    for lines, indexes in requests:
+        if lines and status == UPLOAD_SUCCESS:
+            status = _post("\n".join(lines))
+        for index in indexes:
+            statuses[index] = status
+
+    return statuses
+
+
+async def _post_async(payload):
+    global _async_connection
+    url, body, headers = _request(payload)
+    if _async_connection is None:
+        from enviro.httpsimple import AsyncHTTPConnection
+
+        _async_connection = AsyncHTTPConnection(url)
+
+    try:
+        status, reason, _, _ = await _async_connection.request("POST", body, headers)
+        if status == 204:
+            return UPLOAD_SUCCESS
+
+        logging.debug(f"  - upload issue ({status} {reason})")
+    except Exception as e:
+        logging.debug(f"  - an exception occurred when uploading: {e}")
+
+    return UPLOAD_FAILED
+
+
+# non-blocking versions of upload_reading() and upload_batch(), used when
+# uploading to more than one destination at the same time
+async def upload_reading_async(reading):
+    if config.influxdb_batch:
+        return (await upload_batch_async([reading]))[0]
+
+    return await _post_async(_reading_payload(reading))
+
+
+async def upload_batch_async(readings):
+    statuses, requests = _batch_requests(readings)
+
+    status = UPLOAD_SUCCESS
+    for lines, indexes in requests:
+        if lines and status == UPLOAD_SUCCESS:
+            status = await _post_async("\n".join(lines))
+        for index in indexes:
+            statuses[index] = status
+
+    return statuses
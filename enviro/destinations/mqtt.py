@@ -2,6 +2,7 @@ from enviro import logging
 from enviro.constants import UPLOAD_SUCCESS, UPLOAD_FAILED, I2C_ADDR_LTR390
 from enviro.mqttsimple import MQTTClient
 from enviro import i2c_devices
+import enviro.helpers as helpers
 import ujson
 import config
 
@@ -12,32 +13,93 @@ def log_destination():
     )
 
 
-def upload_reading(reading):
+# mqtt client kept open between open_session() and close_session() so that
+# the whole upload backlog is published over a single broker connection
+_session_client = None
+
+
+def _create_client(client_id):
     server = config.mqtt_broker_address
     username = config.mqtt_broker_username
     password = config.mqtt_broker_password
-    nickname = reading["nickname"]
 
+    if config.mqtt_broker_ca_file:
+        # Using SSL
+        f = open("ca.crt")
+        ssl_data = f.read()
+        f.close()
+        return MQTTClient(
+            client_id,
+            server,
+            user=username,
+            password=password,
+            keepalive=60,
+            ssl=True,
+            ssl_params={"cert": ssl_data},
+        )
+
+    # Not using SSL
+    return MQTTClient(client_id, server, user=username, password=password, keepalive=60)
+
+
+def _log_exception(message, exc):
+    import sys, io
+
+    buf = io.StringIO()
+    sys.print_exception(exc, buf)
+    logging.debug(message, buf.getvalue())
+
+
+def open_session():
+    global _session_client
+    _session_client = None
     try:
-        if config.mqtt_broker_ca_file:
-            # Using SSL
-            f = open("ca.crt")
-            ssl_data = f.read()
-            f.close()
-            mqtt_client = MQTTClient(
-                reading["uid"],
-                server,
-                user=username,
-                password=password,
-                keepalive=60,
-                ssl=True,
-                ssl_params={"cert": ssl_data},
-            )
-        else:
-            # Not using SSL
-            mqtt_client = MQTTClient(
-                reading["uid"], server, user=username, password=password, keepalive=60
+        mqtt_client = _create_client(helpers.uid())
+        mqtt_client.connect()
+        _session_client = mqtt_client
+        logging.info(f"  - connected to mqtt broker")
+        return True
+    except Exception as exc:
+        # readings will fall back to connecting one at a time
+        _log_exception(f"  - an exception occurred when opening mqtt session.", exc)
+    return False
+
+
+def close_session():
+    global _session_client
+    if _session_client is None:
+        return
+
+    mqtt_client = _session_client
+    _session_client = None
+    try:
+        mqtt_client.disconnect()
+        logging.info(f"  - disconnected from mqtt broker")
+    except Exception as exc:
+        _log_exception(
+            f"  - an exception occurred when disconnecting mqtt client.", exc
+        )
+
+
+def upload_reading(reading):
+    global _session_client
+    nickname = reading["nickname"]
+
+    if _session_client is not None:
+        try:
+            _session_client.publish(
+                f"enviro/{nickname}", ujson.dumps(reading), retain=True
             )
+            return UPLOAD_SUCCESS
+        except Exception as exc:
+            # the session is no longer usable, drop it so that the next reading
+            # starts from a fresh connection
+            _log_exception(f"  - an exception occurred when uploading.", exc)
+            close_session()
+            return UPLOAD_FAILED
+
+    try:
+        mqtt_client = _create_client(reading["uid"])
         # Now continue with connection and upload
         mqtt_client.connect()
         mqtt_client.publish(f"enviro/{nickname}", ujson.dumps(reading), retain=True)
@@ -47,28 +109,15 @@ def upload_reading(reading):
     # Try disconneting to see if it prevents hangs on this typew of errors recevied so far
     except (OSError, IndexError) as exc:
         try:
-            import sys, io
-
-            buf = io.StringIO()
-            sys.print_exception(exc, buf)
-            logging.debug(f"  - an exception occurred when uploading.", buf.getvalue())
+            _log_exception(f"  - an exception occurred when uploading.", exc)
             mqtt_client.disconnect()
         except Exception as exc:
-            import sys, io
-
-            buf = io.StringIO()
-            sys.print_exception(exc, buf)
-            logging.debug(
-                f"  - an exception occurred when disconnecting mqtt client.",
-                buf.getvalue(),
+            _log_exception(
+                f"  - an exception occurred when disconnecting mqtt client.", exc
             )
 
     except Exception as exc:
-        import sys, io
-
-        buf = io.StringIO()
-        sys.print_exception(exc, buf)
-        logging.debug(f"  - an exception occurred when uploading.", buf.getvalue())
+        _log_exception(f"  - an exception occurred when uploading.", exc)
 
     return UPLOAD_FAILED
 
@@ -150,6 +199,24 @@ def hass_discovery(board_type):
             mqtt_client,
             "mdi:weather-windy-variant",
         )  # Wind Gust
+        mqtt_discovery(
+            "Wind Speed Average",
+            "wind_speed",
+            "m/s",
+            "wind_speed_avg",
+            board_type,
+            mqtt_client,
+            "mdi:weather-windy",
+        )  # Wind Speed Average
+        mqtt_discovery(
+            "Wind Speed Deviation",
+            "wind_speed",
+            "m/s",
+            "wind_speed_stddev",
+            board_type,
+            mqtt_client,
+            "mdi:sigma",
+        )  # Wind Speed Deviation
         mqtt_discovery(
             "Wind Direction",
             "none",
@@ -204,6 +271,15 @@ def hass_discovery(board_type):
             mqtt_client,
             "mdi:weather-rainy",
         )  # Rain Today
+        mqtt_discovery(
+            "Rain Rate",
+            "precipitation_intensity",
+            "mm/h",
+            "rain_rate",
+            board_type,
+            mqtt_client,
+            "mdi:weather-pouring",
+        )  # Rain Rate
         mqtt_discovery(
             "Dew Point",
             "temperature",
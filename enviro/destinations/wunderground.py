@@ -11,6 +11,11 @@ from enviro.helpers import (
 )
 
 
+# the only derived readings sent to weather underground
+def derived_readings():
+    return ("dewpoint", "sea_level_pressure")
+
+
 def log_destination():
     logging.info(
         f"> uploading cached readings to Weather Underground device: {config.wunderground_id}"
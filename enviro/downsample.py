@@ -0,0 +1,126 @@
+import time
+import enviro.helpers as helpers
+import enviro.journal as journal
+import enviro.records as records
+from phew import logging
+import config
+
+# backlog downsampling
+#
+# when the disk is nearly full and readings can't be uploaded, rather than
+# stopping the oldest cached readings that haven't been sent anywhere yet are
+# merged into one reading per config.downsample_interval minutes. the merged
+# reading holds the mean of each value, plus:
+#
+#   "samples"  how many readings were merged
+#   "min"      the lowest value of each reading
+#   "max"      the highest value of each reading
+#
+# merged readings can be merged again, so a long outage keeps losing
+# resolution rather than readings.
+
+# how many journal segments are merged at a time
+SEGMENTS_PER_PASS = 4
+
+
+def _merge_group(payloads):
+    first = payloads[0]
+    count = 0
+    totals = {}
+    weights = {}
+    lowest = {}
+    highest = {}
+    for payload in payloads:
+        samples = payload.get("samples", 1)
+        count += samples
+        for key, value in payload["readings"].items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            totals[key] = totals.get(key, 0) + value * samples
+            weights[key] = weights.get(key, 0) + samples
+            low = payload.get("min", {}).get(key, value)
+            high = payload.get("max", {}).get(key, value)
+            lowest[key] = min(lowest.get(key, low), low)
+            highest[key] = max(highest.get(key, high), high)
+
+    from ucollections import OrderedDict
+
+    # start from the newest reading so that anything that can't be averaged
+    # (and any other payload fields) keeps its latest value
+    merged = dict(payloads[-1])
+    readings = OrderedDict()
+    for key, value in payloads[-1]["readings"].items():
+        if key in weights:
+            readings[key] = round(totals[key] / weights[key], 4)
+        else:
+            readings[key] = value
+    merged["readings"] = readings
+    merged["timestamp"] = first["timestamp"]
+    merged["samples"] = count
+    merged["min"] = lowest
+    merged["max"] = highest
+    if "seq" in first:
+        merged["seq"] = first["seq"]
+    return merged
+
+
+# journal.compact() callback, merges the payloads into one per interval
+def _merge(payloads):
+    interval = config.downsample_interval * 60
+
+    groups = []
+    group_key = None
+    for payload in payloads:
+        try:
+            reading = records.decode(payload)
+            key = (
+                helpers.timestamp(reading["timestamp"]) // interval,
+                reading["nickname"],
+                reading["model"],
+                tuple(reading["readings"].keys()),
+            )
+        except (ValueError, KeyError):
+            # can't be merged, keep it as it is
+            groups.append(payload)
+            group_key = None
+            continue
+
+        if key == group_key:
+            groups[-1].append(reading)
+        else:
+            groups.append([reading])
+            group_key = key
+
+    merged = []
+    for group in groups:
+        if not isinstance(group, list):
+            merged.append(group)
+        elif len(group) == 1:
+            merged.append(records.encode(group[0]))
+        else:
+            merged.append(records.encode(_merge_group(group)))
+    return merged
+
+
+# merge the oldest cached readings until there is enough disk space again,
+# returns True if any readings were merged
+def downsample_cached_readings(low_disk_space):
+    if not config.downsample_interval:
+        return False
+
+    start_ms = time.ticks_ms()
+    removed = 0
+    while True:
+        count = journal.compact(_merge, SEGMENTS_PER_PASS)
+        if count == 0:
+            break
+        removed += count
+        if not low_disk_space():
+            break
+
+    if removed:
+        elapsed_ms = time.ticks_diff(time.ticks_ms(), start_ms)
+        logging.info(
+            f"> merged {removed} cached reading(s) to free disk space ({elapsed_ms}ms)"
+        )
+    return removed > 0
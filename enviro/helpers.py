@@ -1,6 +1,7 @@
 from enviro.constants import *
-import machine, math, os, time, utime
+import errno, machine, math, os, time, utime, ujson, ubinascii
 from phew import logging
+import enviro.psychrometric_tables as psychrometric_tables
 import config
 
 ADC_VOLT_CONVERSION = 3.3 / 65535  # fator de conversão ADC → volts
@@ -152,9 +153,7 @@ def update_config(var_name, new_value):
             new_lines.append(f"\n{var_name} = {new_value_str}\n")
 
         # Write lines back to file (MicroPython-safe)
-        with open("config.py", "w") as f:
-            for line in new_lines:
-                f.write(line)
+        write_file_atomic("config.py", "".join(new_lines))
 
         logging.info(f"Variable '{var_name}' updated to {new_value_str}")
         return True
@@ -204,6 +203,76 @@ def mkdir_safe(path):
         pass  # directory already exists, this is fine
 
 
+# write a file so that a power cut leaves either the old or the new contents
+# behind, never a partial file. the data goes to a temporary file which then
+# replaces the target
+def write_file_atomic(filename, data):
+    temp = filename + ".tmp"
+    with open(temp, "wb" if isinstance(data, (bytes, bytearray)) else "w") as f:
+        f.write(data)
+        f.flush()
+    if hasattr(os, "sync"):
+        os.sync()
+    try:
+        os.rename(temp, filename)
+    except OSError:
+        # some filesystems won't rename over an existing file
+        os.remove(filename)
+        os.rename(temp, filename)
+
+
+# json state files end with a line holding the crc32 of the json so that a
+# damaged file is detected rather than half read
+def save_json(filename, data):
+    text = ujson.dumps(data)
+    crc = ubinascii.crc32(text.encode("utf-8"))
+    write_file_atomic(filename, f"{text}\n{crc:08x}\n")
+
+
+# raises OSError if the file is missing and ValueError if it is damaged, files
+# written before crcs were added are read as plain json
+def load_json(filename):
+    with open(filename, "r") as f:
+        text = f.read()
+
+    end = text.rstrip().rfind("\n")
+    if end != -1:
+        crc = text[end + 1 :].strip()
+        text = text[:end]
+        if crc != f"{ubinascii.crc32(text.encode('utf-8')):08x}":
+            raise ValueError(f"{filename} is damaged")
+    return ujson.loads(text)
+
+
+# state that can't be worked out again if it is lost (the ids that binary
+# records refer to) also keeps a copy in filename + ".bak". the copy is written
+# first so that it always holds at least what the file itself holds
+def save_json_with_backup(filename, data):
+    save_json(filename + ".bak", data)
+    save_json(filename, data)
+
+
+# falls back to the backup if the file is missing or damaged, raises OSError if
+# neither exists and ValueError if neither can be read
+def load_json_with_backup(filename):
+    damaged = None
+    for path in (filename, filename + ".bak"):
+        try:
+            data = load_json(path)
+        except OSError:
+            continue
+        except ValueError as e:
+            damaged = e
+            continue
+        if path != filename:
+            logging.warn(f"  ! {filename} is missing or damaged, using its backup")
+        return data
+
+    if damaged is not None:
+        raise damaged
+    raise OSError(errno.ENOENT, filename)
+
+
 def copy_file(source, target):
     with open(source, "rb") as infile:
         with open(target, "wb") as outfile:
@@ -214,6 +283,44 @@ def copy_file(source, target):
                 outfile.write(chunk)
 
 
+# upload helpers
+# ===========================================================================
+
+
+# key that is the same every time a reading is sent, so that the receiving end
+# can spot retries. None for readings cached before sequence numbers were added
+def idempotency_key(reading):
+    seq = reading.get("seq")
+    if seq is None:
+        return None
+    return f"{reading['uid']}-{seq}"
+
+
+# gzip an upload body that is at least threshold bytes long (0 never
+# compresses), returns the body to send and its content encoding (None if it
+# was left as is). firmware without deflate compression sends the body as is
+def gzip_body(body, threshold):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if not threshold or len(body) < threshold:
+        return body, None
+
+    try:
+        import deflate, io
+
+        stream = io.BytesIO()
+        with deflate.DeflateIO(stream, deflate.GZIP) as compressor:
+            compressor.write(body)
+        compressed = stream.getvalue()
+    except Exception as e:
+        logging.debug(f"  - cannot compress upload: {e}")
+        return body, None
+
+    if len(compressed) >= len(body):
+        return body, None
+    return compressed, "gzip"
+
+
 # temperature and humidity helpers
 # ===========================================================================
 
@@ -241,7 +348,21 @@ def absolute_to_relative_humidity(absolute_humidity, temperature_in_c):
     )
 
 
+# the dewpoint and saturation vapour pressure use interpolated lookup tables
+# (enviro/psychrometric_tables.py, built and checked against the exact
+# formulas by tools/psychrometric_tables.py) in place of math.log and
+# fractional powers, which the rp2040 has to do in software, and fall back to
+# the exact formulas outside of them. tools/psychrometrics_benchmark.py times
+# the two on the board
 def calculate_dewpoint(temperature_in_c, relative_humidity):
+    alphatrh = _ln_relative_humidity(relative_humidity) + (
+        (17.625 * temperature_in_c) / (243.04 + temperature_in_c)
+    )
+    dewpoint_in_c = (243.04 * alphatrh) / (17.625 - alphatrh)
+    return dewpoint_in_c
+
+
+def calculate_dewpoint_exact(temperature_in_c, relative_humidity):
     alphatrh = (math.log((relative_humidity / 100))) + (
         (17.625 * temperature_in_c) / (243.04 + temperature_in_c)
     )
@@ -249,6 +370,19 @@ def calculate_dewpoint(temperature_in_c, relative_humidity):
     return dewpoint_in_c
 
 
+# log(relative_humidity / 100)
+def _ln_relative_humidity(relative_humidity):
+    tables = psychrometric_tables
+    position = (relative_humidity - tables.LN_RH_MIN) / tables.LN_RH_STEP
+    index = int(position)
+    if position < 0 or index >= len(tables.LN_RH) - 1:
+        if relative_humidity == tables.LN_RH_MAX:
+            return tables.LN_RH[-1]
+        return math.log(relative_humidity / 100)
+    low = tables.LN_RH[index]
+    return low + (tables.LN_RH[index + 1] - low) * (position - index)
+
+
 def celcius_to_kelvin(temperature_in_c):
     return temperature_in_c + 273.15
 
@@ -294,6 +428,16 @@ def get_actual_vapor_pressure(relative_humidity, temperature_in_k):
 
 
 def get_saturation_vapor_pressure(temperature_in_k):
+    tables = psychrometric_tables
+    position = (temperature_in_k - 273.15 - tables.SVP_MIN_C) / tables.SVP_STEP_C
+    index = int(position)
+    if position < 0 or index >= len(tables.SVP) - 1:
+        return get_saturation_vapor_pressure_exact(temperature_in_k)
+    low = tables.SVP[index]
+    return low + (tables.SVP[index + 1] - low) * (position - index)
+
+
+def get_saturation_vapor_pressure_exact(temperature_in_k):
     v = 1 - (temperature_in_k / CRITICAL_WATER_TEMPERATURE)
 
     # empirical constants
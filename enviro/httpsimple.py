@@ -0,0 +1,276 @@
+import usocket as socket
+import time
+import enviro.telemetry as telemetry
+
+
+class HTTPException(Exception):
+    pass
+
+
+def _parse_status_line(line):
+    if not line:
+        raise HTTPException("connection closed")
+    parts = line.decode().split(None, 2)
+    status = int(parts[1])
+    reason = parts[2].rstrip() if len(parts) > 2 else ""
+    return status, reason
+
+
+def _parse_header_line(line, headers):
+    key, value = line.decode().split(":", 1)
+    headers[key.strip().lower()] = value.strip()
+
+
+# minimal http/1.1 client that keeps its connection open between requests so
+# that many requests to the same server only pay for one tcp (and tls)
+# handshake. if the server closes the connection it is reopened on the next
+# request.
+class HTTPConnection:
+    def __init__(self, url, timeout=30):
+        try:
+            proto, _, host, path = url.split("/", 3)
+        except ValueError:
+            proto, _, host = url.split("/", 2)
+            path = ""
+
+        if proto == "http:":
+            port = 80
+        elif proto == "https:":
+            port = 443
+        else:
+            raise ValueError("unsupported protocol: " + proto)
+
+        if ":" in host:
+            host, port = host.split(":", 1)
+            port = int(port)
+
+        self.host = host
+        self.port = port
+        self.path = "/" + path
+        self.ssl = proto == "https:"
+        self.timeout = timeout
+        self.sock = None
+
+    def connect(self):
+        started_ms = time.ticks_ms()
+        addr = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)[0][-1]
+        telemetry.record_since("dns", started_ms)
+
+        sock = socket.socket()
+        sock.settimeout(self.timeout)
+        try:
+            started_ms = time.ticks_ms()
+            sock.connect(addr)
+            telemetry.record_since("connect", started_ms)
+            if self.ssl:
+                import ussl
+
+                started_ms = time.ticks_ms()
+                sock = ussl.wrap_socket(sock, server_hostname=self.host)
+                telemetry.record_since("tls", started_ms)
+        except Exception:
+            sock.close()
+            raise
+        self.sock = sock
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def _request_head(self, method, headers, length):
+        head = f"{method} {self.path} HTTP/1.1\r\nHost: {self.host}\r\n"
+        for key, value in headers.items():
+            head += f"{key}: {value}\r\n"
+        head += f"Content-Length: {length}\r\n\r\n"
+        return head.encode()
+
+    def _send(self, method, body, headers):
+        started_ms = time.ticks_ms()
+        head = self._request_head(method, headers, len(body))
+        self.sock.write(head)
+        if body:
+            self.sock.write(body)
+        telemetry.record_since("send", started_ms)
+        telemetry.record_bytes(sent=len(head) + len(body))
+
+    def _read_exactly(self, length):
+        data = b""
+        while len(data) < length:
+            chunk = self.sock.read(length - len(data))
+            if not chunk:
+                raise HTTPException("connection closed")
+            data += chunk
+        return data
+
+    def _read_response(self):
+        started_ms = time.ticks_ms()
+        status, reason = _parse_status_line(self.sock.readline())
+        telemetry.record_since("ack", started_ms)
+
+        headers = {}
+        while True:
+            line = self.sock.readline()
+            if not line or line == b"\r\n":
+                break
+            _parse_header_line(line, headers)
+
+        body = b""
+        if status in (204, 304):
+            # these never have a body
+            pass
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.sock.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.sock.readline()
+                    break
+                body += self._read_exactly(size)
+                self.sock.readline()
+        elif "content-length" in headers:
+            body = self._read_exactly(int(headers["content-length"]))
+        else:
+            # no length given, the body runs until the server closes
+            while True:
+                chunk = self.sock.read(512)
+                if not chunk:
+                    break
+                body += chunk
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+
+        telemetry.record_bytes(received=len(body))
+        return status, reason, headers, body
+
+    # send a request and return (status, reason, headers, body), a request on a
+    # reused connection is retried once on a fresh connection if it fails
+    def request(self, method, body=b"", headers={}):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        reused = self.sock is not None
+        for attempt in range(2):
+            if self.sock is None:
+                self.connect()
+            try:
+                self._send(method, body, headers)
+                return self._read_response()
+            except (OSError, HTTPException):
+                self.close()
+                if not reused or attempt > 0:
+                    raise
+                reused = False
+
+
+# the same client built on uasyncio streams, while one request is waiting on
+# the network other tasks (e.g. an upload to another destination) keep running
+class AsyncHTTPConnection(HTTPConnection):
+    async def connect(self):
+        import uasyncio
+
+        # the dns lookup, connection and tls handshake all happen inside
+        # open_connection() so they are only timed as a whole
+        started_ms = time.ticks_ms()
+        if self.ssl:
+            stream = uasyncio.open_connection(self.host, self.port, ssl=True)
+        else:
+            stream = uasyncio.open_connection(self.host, self.port)
+        self.reader, self.sock = await uasyncio.wait_for(stream, self.timeout)
+        telemetry.record_since("connect", started_ms)
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+            self.reader = None
+
+    async def _send(self, method, body, headers):
+        started_ms = time.ticks_ms()
+        head = self._request_head(method, headers, len(body))
+        self.sock.write(head)
+        if body:
+            self.sock.write(body)
+        await self.sock.drain()
+        telemetry.record_since("send", started_ms)
+        telemetry.record_bytes(sent=len(head) + len(body))
+
+    async def _read_exactly(self, length):
+        data = b""
+        while len(data) < length:
+            chunk = await self.reader.read(length - len(data))
+            if not chunk:
+                raise HTTPException("connection closed")
+            data += chunk
+        return data
+
+    async def _read_response(self):
+        reader = self.reader
+        started_ms = time.ticks_ms()
+        status, reason = _parse_status_line(await reader.readline())
+        telemetry.record_since("ack", started_ms)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if not line or line == b"\r\n":
+                break
+            _parse_header_line(line, headers)
+
+        body = b""
+        if status in (204, 304):
+            pass
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                body += await self._read_exactly(size)
+                await reader.readline()
+        elif "content-length" in headers:
+            body = await self._read_exactly(int(headers["content-length"]))
+        else:
+            while True:
+                chunk = await reader.read(512)
+                if not chunk:
+                    break
+                body += chunk
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+
+        telemetry.record_bytes(received=len(body))
+        return status, reason, headers, body
+
+    async def _exchange(self, method, body, headers):
+        if self.sock is None:
+            await self.connect()
+        await self._send(method, body, headers)
+        return await self._read_response()
+
+    async def request(self, method, body=b"", headers={}):
+        import uasyncio
+
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        reused = self.sock is not None
+        for attempt in range(2):
+            try:
+                return await uasyncio.wait_for(
+                    self._exchange(method, body, headers), self.timeout
+                )
+            except (OSError, HTTPException, uasyncio.TimeoutError):
+                self.close()
+                if not reused or attempt > 0:
+                    raise
+                reused = False
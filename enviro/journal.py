@@ -0,0 +1,592 @@
+import os, time, ustruct, ubinascii
+import enviro.helpers as helpers
+from phew import logging
+
+# cached uploads are appended to fixed size segment files in the uploads
+# directory rather than being written out one file per reading. each
+# destination has its own persisted read cursor tracking what has been
+# delivered to it, once every cursor has read past a segment it is deleted.
+#
+# each record is a little endian uint16 length followed by the payload bytes
+# and a uint32 crc32 of the payload. the top bit of the length is set on
+# records that have a crc, records written before crcs were added don't
+JOURNAL_DIR = "uploads"
+STATE_FILE = "uploads/journal.json"
+SEGMENT_SIZE = 4096  # one littlefs block on the pico w
+RECORD_HEADER = "<H"
+RECORD_HEADER_SIZE = 2
+RECORD_CRC = "<I"
+RECORD_CRC_SIZE = 4
+RECORD_CRC_FLAG = 0x8000
+MAX_RECORD_LENGTH = 0x7FFF
+
+_state = None
+
+
+def _segment_path(segment):
+    return f"{JOURNAL_DIR}/{segment:08d}.seg"
+
+
+def _empty_state():
+    return {
+        "first_segment": 0,  # oldest segment still on disk
+        "write_segment": 0,
+        "write_offset": 0,
+        "read_segment": 0,  # oldest position any cursor still needs
+        "read_offset": 0,
+        "appended": 0,  # total records ever appended
+        "consumed": 0,  # total records ever delivered to every cursor
+        "merged": 0,  # total records removed by compact()
+        "sequence": 0,  # sequence number of the next record (next_sequence())
+        # name: [segment, offset, records delivered, positions delivered ahead]
+        "cursors": {},
+    }
+
+
+def _save_state():
+    helpers.save_json(STATE_FILE, _state)
+
+
+def _record(payload):
+    if len(payload) > MAX_RECORD_LENGTH:
+        raise ValueError("record too long")
+    header = ustruct.pack(RECORD_HEADER, len(payload) | RECORD_CRC_FLAG)
+    crc = ustruct.pack(RECORD_CRC, ubinascii.crc32(payload))
+    return header + payload + crc
+
+
+# reads the record at the current position in the segment file, returns
+# (payload, size) or None at the end of the segment (or if the record was cut
+# short). payload is b"" if the record is damaged
+def _read_record(f):
+    header = f.read(RECORD_HEADER_SIZE)
+    if len(header) < RECORD_HEADER_SIZE:
+        return None
+    (length,) = ustruct.unpack(RECORD_HEADER, header)
+    has_crc = length & RECORD_CRC_FLAG
+    length &= MAX_RECORD_LENGTH
+
+    payload = f.read(length)
+    if len(payload) < length:
+        return None
+    size = RECORD_HEADER_SIZE + length
+
+    if has_crc:
+        crc = f.read(RECORD_CRC_SIZE)
+        if len(crc) < RECORD_CRC_SIZE:
+            return None
+        size += RECORD_CRC_SIZE
+        if ustruct.unpack(RECORD_CRC, crc)[0] != ubinascii.crc32(payload):
+            logging.error(f"  ! damaged record in upload journal")
+            payload = b""
+
+    return payload, size
+
+
+def _segment_numbers():
+    segments = []
+    for entry in os.ilistdir(JOURNAL_DIR):
+        name = entry[0]
+        if name.endswith(".seg"):
+            try:
+                segments.append(int(name[:-4]))
+            except ValueError:
+                pass
+    segments.sort()
+    return segments
+
+
+def _count_records(segment):
+    count = 0
+    offset = 0
+    with open(_segment_path(segment), "rb") as f:
+        while True:
+            record = _read_record(f)
+            if record is None:
+                break
+            offset += record[1]
+            count += 1
+    return count, offset
+
+
+# only needed when the state file is missing, rebuilds the state from the
+# segments on disk and treats every record in them as undelivered.
+#
+# the sequence numbers already handed out can't be worked out again (the
+# segments they were in may have been deleted) so they carry on from the
+# current time in seconds (as they do on a new device). far fewer than one
+# reading a second is ever cached so that is always past any number given out
+# before, and numbers are never reused
+def _rebuild_state():
+    state = _empty_state()
+    state["sequence"] = time.time()
+    segments = _segment_numbers()
+    if segments:
+        state["first_segment"] = segments[0]
+        state["read_segment"] = segments[0]
+        state["write_segment"] = segments[-1]
+        for segment in segments:
+            count, offset = _count_records(segment)
+            state["appended"] += count
+        state["write_offset"] = offset
+        logging.warn(f"> rebuilt upload journal, {state['appended']} reading(s) found")
+    return state
+
+
+# readings cached by older firmware are stored one json file per reading,
+# move them into the journal so that they are still uploaded
+def _import_legacy_uploads():
+    filenames = []
+    for entry in os.ilistdir(JOURNAL_DIR):
+        name = entry[0]
+        if name.endswith(".json") and f"{JOURNAL_DIR}/{name}" != STATE_FILE:
+            filenames.append(name)
+
+    for name in sorted(filenames):
+        path = f"{JOURNAL_DIR}/{name}"
+        try:
+            with open(path, "r") as f:
+                append(f.read())
+        except OSError:
+            logging.error(f"  ! failed to import cached upload '{name}'")
+            continue
+        os.remove(path)
+
+    if filenames:
+        logging.info(f"> imported {len(filenames)} cached upload file(s) into journal")
+
+
+def _load_state():
+    global _state
+    if _state is not None:
+        return _state
+
+    helpers.mkdir_safe(JOURNAL_DIR)
+    try:
+        _state = helpers.load_json(STATE_FILE)
+        if "compaction" in _state:
+            # the power was cut part way through compact()
+            _finish_compaction()
+        _recover()
+    except (OSError, ValueError):
+        _state = _rebuild_state()
+        _recover()
+        _save_state()
+        _import_legacy_uploads()
+    return _state
+
+
+# records are written to the segment before the state is saved, so a power
+# cut while appending can leave records that the state doesn't know about, or
+# half a record, at the end of the write segment. nothing else is ever
+# modified in place so only the end of the write segment needs checking
+def _recover():
+    global _state
+    path = _segment_path(_state["write_segment"])
+    size = helpers.file_size(path) or 0
+    offset = _state["write_offset"]
+    if size == offset:
+        return
+
+    if size < offset:
+        # the segment is shorter than it should be, work it all out again
+        logging.warn(f"> upload journal segment is shorter than expected")
+        raise ValueError("journal state does not match segments")
+
+    found = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            record = _read_record(f)
+            if record is None:
+                break
+            offset += record[1]
+            found += 1
+
+    if offset < size:
+        # drop the partly written record
+        with open(path, "rb") as f:
+            data = f.read(offset)
+        helpers.write_file_atomic(path, data)
+
+    logging.warn(f"> recovered upload journal, {found} reading(s) found")
+    _state["write_offset"] = offset
+    _state["appended"] += found
+    _state["sequence"] = next_sequence() + found
+    _save_state()
+
+
+# sequence number of the next record to be appended, these only ever count up
+# (see _rebuild_state())
+def next_sequence():
+    state = _load_state()
+    # states saved before the sequence was kept separately
+    return state.get("sequence", state["appended"])
+
+
+# add a payload (str or bytes) to the end of the journal
+def append(payload):
+    state = _load_state()
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+
+    record = _record(payload)
+    size = len(record)
+    if state["write_offset"] > 0 and state["write_offset"] + size > SEGMENT_SIZE:
+        state["write_segment"] += 1
+        state["write_offset"] = 0
+
+    with open(_segment_path(state["write_segment"]), "ab") as f:
+        f.write(record)
+
+    state["write_offset"] += size
+    state["sequence"] = next_sequence() + 1
+    state["appended"] += 1
+    _save_state()
+
+
+# number of records that have ever been in the journal, less any merged away
+def _record_count(state):
+    return state["appended"] - state.get("merged", 0)
+
+
+def _cursor(state, name):
+    cursors = state.setdefault("cursors", {})
+    if name not in cursors:
+        # new cursors start from the oldest record that is still kept
+        cursors[name] = [state["read_segment"], state["read_offset"], state["consumed"]]
+    cursor = cursors[name]
+    if len(cursor) < 4:
+        # records delivered out of order (see deliver_ahead())
+        cursor.append([])
+    return cursor
+
+
+# every destination reads the journal through its own named cursor, this drops
+# the cursors of destinations that are no longer configured so that they don't
+# hold on to records forever
+def use_cursors(names):
+    state = _load_state()
+    cursors = state.setdefault("cursors", {})
+    for name in list(cursors.keys()):
+        if name not in names:
+            del cursors[name]
+    for name in names:
+        _cursor(state, name)
+
+
+# number of records waiting to be delivered to the named cursor, or to any
+# cursor if no name is given
+def pending_count(name=None):
+    state = _load_state()
+    if name is None:
+        return _record_count(state) - state["consumed"]
+    cursor = _cursor(state, name)
+    return _record_count(state) - cursor[2] - len(cursor[3])
+
+
+# returns up to count records that have not been delivered to the named cursor
+# as (position, payload) tuples in the order they were appended, pass the
+# position to advance() once delivered
+def read(count, name):
+    state = _load_state()
+    entries = []
+    segment, offset, _, ahead = _cursor(state, name)
+
+    while len(entries) < count and segment <= state["write_segment"]:
+        try:
+            f = open(_segment_path(segment), "rb")
+        except OSError:
+            # segment is missing, nothing to read from it
+            segment += 1
+            offset = 0
+            continue
+
+        with f:
+            f.seek(offset)
+            while len(entries) < count:
+                record = _read_record(f)
+                if record is None:
+                    break
+                payload, size = record
+                offset += size
+                if [segment, offset] not in ahead:
+                    entries.append(((segment, offset), payload))
+
+        if len(entries) < count:
+            # reached the end of this segment
+            segment += 1
+            offset = 0
+
+    return entries
+
+
+# move the named cursor past its oldest undelivered records so that no more
+# than keep are left waiting for it, call commit() to persist it. returns the
+# number of records dropped
+def drop_oldest(name, keep):
+    excess = pending_count(name) - keep
+    dropped = 0
+    while dropped < excess:
+        # a few at a time so that a long backlog isn't all read into memory
+        entries = read(min(excess - dropped, 16), name)
+        if not entries:
+            break
+        advance(entries[-1][0], name, len(entries))
+        dropped += len(entries)
+    return dropped
+
+
+# returns up to count of the newest records that have not been delivered to
+# the named cursor, oldest first. pass their positions to deliver_ahead()
+def read_latest(count, name):
+    state = _load_state()
+    cursor = _cursor(state, name)
+    start = (cursor[0], cursor[1])
+
+    # work back from the newest segment until enough records have been found
+    entries = []
+    segment = state["write_segment"]
+    while len(entries) < count and segment >= start[0]:
+        found = []
+        try:
+            with open(_segment_path(segment), "rb") as f:
+                offset = 0
+                while True:
+                    record = _read_record(f)
+                    if record is None:
+                        break
+                    payload, size = record
+                    offset += size
+                    position = (segment, offset)
+                    if position > start and [segment, offset] not in cursor[3]:
+                        found.append((position, payload))
+        except OSError:
+            pass
+        entries = found[-(count - len(entries)) :] + entries
+        segment -= 1
+
+    return entries
+
+
+# mark every record up to and including the one at position as delivered to
+# the named cursor, call commit() to persist it
+def advance(position, name, count=1):
+    state = _load_state()
+    cursor = _cursor(state, name)
+    cursor[0], cursor[1] = position
+
+    # records delivered ahead of the cursor that it has now passed
+    ahead = [p for p in cursor[3] if tuple(p) > tuple(position)]
+    count += len(cursor[3]) - len(ahead)
+    cursor[3] = ahead
+
+    cursor[2] = min(_record_count(state), cursor[2] + count)
+
+
+# mark a single record as delivered to the named cursor without moving the
+# cursor, used when newer records are uploaded before older ones. the cursor
+# steps over it when it catches up
+def deliver_ahead(position, name):
+    state = _load_state()
+    cursor = _cursor(state, name)
+    if [position[0], position[1]] not in cursor[3]:
+        cursor[3].append([position[0], position[1]])
+
+
+# step a cursor over any records directly in front of it that were delivered
+# ahead of it
+def _catch_up(state, cursor):
+    while cursor[3]:
+        try:
+            with open(_segment_path(cursor[0]), "rb") as f:
+                f.seek(cursor[1])
+                record = _read_record(f)
+        except OSError:
+            return
+        if record is None:
+            # end of the segment
+            if cursor[0] >= state["write_segment"]:
+                return
+            cursor[0] += 1
+            cursor[1] = 0
+            continue
+
+        position = [cursor[0], cursor[1] + record[1]]
+        if position not in cursor[3]:
+            return
+        cursor[3].remove(position)
+        cursor[1] = position[1]
+        cursor[2] += 1
+
+
+# step a cursor over any segments that it has reached the end of
+def _normalise(state, cursor):
+    while cursor[0] < state["write_segment"]:
+        size = helpers.file_size(_segment_path(cursor[0]))
+        if size is not None and cursor[1] < size:
+            break
+        cursor[0] += 1
+        cursor[1] = 0
+
+
+# persist the cursors and delete any segments that every cursor has read
+def commit():
+    state = _load_state()
+    cursors = state.setdefault("cursors", {})
+
+    for cursor in cursors.values():
+        _catch_up(state, cursor)
+        _normalise(state, cursor)
+
+    # the oldest cursor decides what can be reclaimed
+    if cursors:
+        oldest = min(cursors.values(), key=lambda cursor: cursor[2])
+        state["read_segment"], state["read_offset"], state["consumed"] = oldest[:3]
+
+    # once everything has been delivered start the next write from a fresh
+    # segment so that the current one can be reclaimed too
+    if state["consumed"] >= _record_count(state) and state["write_offset"] > 0:
+        state["write_segment"] += 1
+        state["write_offset"] = 0
+        state["read_segment"] = state["write_segment"]
+        state["read_offset"] = 0
+        for cursor in cursors.values():
+            cursor[0] = state["write_segment"]
+            cursor[1] = 0
+
+    while state["first_segment"] < state["read_segment"]:
+        try:
+            os.remove(_segment_path(state["first_segment"]))
+        except OSError:
+            pass
+        state["first_segment"] += 1
+
+    _save_state()
+
+
+# the first stretch of records, from the slowest cursor on, that no cursor is
+# part way through: between two neighbouring positions that cursors have been
+# given (their own positions and records delivered ahead of them) and
+# crossing into a later segment. returns (start, end) or None
+def _compactable_range(state):
+    cursors = state.setdefault("cursors", {})
+    for name in list(cursors.keys()):
+        _cursor(state, name)
+
+    start = (state["read_segment"], state["read_offset"])
+    positions = [(state["write_segment"], 0)]
+    for cursor in cursors.values():
+        positions.append((cursor[0], cursor[1]))
+        positions.extend([tuple(position) for position in cursor[3]])
+    if cursors:
+        start = min(positions)
+    positions = sorted([position for position in positions if position > start])
+
+    for end in positions:
+        if end[0] > start[0]:
+            return start, end
+        start = end
+    return None
+
+
+def _read_segment(segment):
+    records = []
+    try:
+        with open(_segment_path(segment), "rb") as f:
+            while True:
+                record = _read_record(f)
+                if record is None:
+                    break
+                records.append(record)
+    except OSError:
+        pass
+    return records
+
+
+# replace the oldest records that no cursor is part way through (see
+# _compactable_range()), from up to segments segments, with merge(payloads)
+# which returns the (fewer) payloads to keep in their place. the write segment
+# is never compacted. returns the number of records removed
+#
+# the merged records are written to a new file next to the first segment,
+# then the state is saved with a note of the compaction. that is the point
+# the compaction takes effect, if the power is cut after it the files are
+# swapped over when the journal is next opened (see _finish_compaction())
+def compact(merge, segments):
+    state = _load_state()
+    found = _compactable_range(state)
+    if found is None:
+        return 0
+    start, end = found
+    start_segment, start_offset = start
+    compacting = []
+    for segment in _segment_numbers():
+        if start_segment <= segment < end[0]:
+            compacting.append(segment)
+    compacting = compacting[:segments]
+    if not compacting:
+        return 0
+
+    # records in the first segment that a cursor has already been given are
+    # kept as they are so that the cursor positions stay valid
+    first_segment = compacting[0]
+    if first_segment != start_segment:
+        start_offset = 0
+    path = _segment_path(first_segment)
+    with open(path, "rb") as f:
+        kept = f.read(start_offset)
+
+    records = []
+    offset = 0
+    for payload, size in _read_segment(first_segment):
+        offset += size
+        if offset > start_offset:
+            records.append(payload)
+    for segment in compacting[1:]:
+        records.extend([payload for payload, _ in _read_segment(segment)])
+
+    # damaged records are dropped
+    merged = merge([payload for payload in records if payload])
+    removed = len(records) - len(merged)
+    if removed <= 0:
+        return 0
+
+    data = bytearray(kept)
+    for payload in merged:
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        data.extend(_record(payload))
+    helpers.write_file_atomic(path + ".new", data)
+
+    # cursors beyond the compacted records had counted them as delivered
+    state["merged"] = state.get("merged", 0) + removed
+    for cursor in state["cursors"].values():
+        if (cursor[0], cursor[1]) > start:
+            cursor[2] = max(0, cursor[2] - removed)
+    state["compaction"] = [first_segment, compacting[1:]]
+    _save_state()
+    _finish_compaction()
+
+    return removed
+
+
+# swap in the merged segment written by compact() and remove the segments
+# whose records were merged into it
+def _finish_compaction():
+    first_segment, merged_segments = _state.pop("compaction")
+    path = _segment_path(first_segment)
+    if helpers.file_exists(path + ".new"):
+        try:
+            os.rename(path + ".new", path)
+        except OSError:
+            # some filesystems won't rename over an existing file
+            os.remove(path)
+            os.rename(path + ".new", path)
+
+    for segment in merged_segments:
+        try:
+            os.remove(_segment_path(segment))
+        except OSError:
+            pass
+    _save_state()
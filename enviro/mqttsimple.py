@@ -1,6 +1,8 @@
 import usocket as socket
 import ustruct as struct
+import time
 from ubinascii import hexlify
+import enviro.telemetry as telemetry
 
 
 class MQTTException(Exception):
@@ -66,12 +68,18 @@ class MQTTClient:
         # def connect(self, clean_session=True, timeout=30): # TODO this was added to 0.0.8
         self.sock = socket.socket()
         # self.sock.settimeout(timeout) # TODO this was added to 0.0.8
+        started_ms = time.ticks_ms()
         addr = socket.getaddrinfo(self.server, self.port)[0][-1]
+        telemetry.record_since("dns", started_ms)
+        started_ms = time.ticks_ms()
         self.sock.connect(addr)
+        telemetry.record_since("connect", started_ms)
         if self.ssl:
             import ussl
 
+            started_ms = time.ticks_ms()
             self.sock = ussl.wrap_socket(self.sock, **self.ssl_params)
+            telemetry.record_since("tls", started_ms)
         premsg = bytearray(b"\x10\0\0\0\0\0")
         msg = bytearray(b"\x04MQTT\x04\x02\0\0")
 
@@ -106,7 +114,9 @@ class MQTTClient:
         if self.user is not None:
             self._send_str(self.user)
             self._send_str(self.pswd)
+        started_ms = time.ticks_ms()
         resp = self.sock.read(4)
+        telemetry.record_since("ack", started_ms)
         assert resp[0] == 0x20 and resp[1] == 0x02
         if resp[3] != 0:
             raise MQTTException(resp[3])
@@ -126,6 +136,7 @@ class MQTTClient:
         if qos > 0:
             sz += 2
         assert sz < 2097152
+        remaining = sz
         i = 1
         while sz > 0x7F:
             pkt[i] = (sz & 0x7F) | 0x80
@@ -133,6 +144,7 @@ class MQTTClient:
             i += 1
         pkt[i] = sz
         # print(hex(len(pkt)), hexlify(pkt, ":"))
+        started_ms = time.ticks_ms()
         self.sock.write(pkt, i + 1)
         self._send_str(topic)
         if qos > 0:
@@ -141,6 +153,8 @@ class MQTTClient:
             struct.pack_into("!H", pkt, 0, pid)
             self.sock.write(pkt, 2)
         self.sock.write(msg)
+        telemetry.record_since("send", started_ms)
+        telemetry.record_bytes(sent=i + 1 + remaining)
         if qos == 1:
             while 1:
                 op = self.wait_msg()
@@ -28,8 +28,7 @@ def write_config():
                 value = getattr(config, key)
                 lines[i] = f"{key} = {repr(value)}"
 
-    with open("config.py", "w") as outfile:
-        outfile.write("\n".join(lines))
+    helpers.write_file_atomic("config.py", "\n".join(lines))
 
 
 import config
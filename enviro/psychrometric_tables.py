@@ -0,0 +1,240 @@
+# generated by tools/psychrometric_tables.py, do not edit
+from array import array
+
+# saturation vapour pressure (Pa) every SVP_STEP_C from SVP_MIN_C to SVP_MAX_C
+SVP_MIN_C = -40
+SVP_MAX_C = 85
+SVP_STEP_C = 1
+SVP = array(
+    "f",
+    (
+        19.046,
+        21.1073,
+        23.3692,
+        25.8491,
+        28.5655,
+        31.5382,
+        34.7886,
+        38.3395,
+        42.2155,
+        46.4425,
+        51.0487,
+        56.0637,
+        61.5196,
+        67.4501,
+        73.8915,
+        80.8823,
+        88.4635,
+        96.6785,
+        105.5737,
+        115.1982,
+        125.604,
+        136.8464,
+        148.9838,
+        162.0783,
+        176.1952,
+        191.404,
+        207.7777,
+        225.3937,
+        244.3335,
+        264.6831,
+        286.5331,
+        309.979,
+        335.1213,
+        362.0657,
+        390.9234,
+        421.8112,
+        454.8517,
+        490.1738,
+        527.9124,
+        568.2093,
+        611.2128,
+        657.0785,
+        705.9689,
+        758.0543,
+        813.5127,
+        872.5302,
+        935.3012,
+        1002.0285,
+        1072.9239,
+        1148.2084,
+        1228.1122,
+        1312.8753,
+        1402.7478,
+        1497.9898,
+        1598.8723,
+        1705.677,
+        1818.6968,
+        1938.236,
+        2064.6109,
+        2198.1499,
+        2339.1937,
+        2488.0959,
+        2645.2231,
+        2810.9554,
+        2985.6866,
+        3169.8245,
+        3363.7915,
+        3568.0246,
+        3782.9761,
+        4009.1134,
+        4246.9199,
+        4496.8952,
+        4759.5552,
+        5035.4327,
+        5325.0776,
+        5629.0574,
+        5947.9574,
+        6282.3811,
+        6632.9506,
+        7000.307,
+        7385.1105,
+        7788.041,
+        8209.7984,
+        8651.103,
+        9112.6955,
+        9595.3378,
+        10099.8133,
+        10626.9269,
+        11177.5056,
+        11752.3988,
+        12352.4789,
+        12978.641,
+        13631.8039,
+        14312.9101,
+        15022.9263,
+        15762.8434,
+        16533.6773,
+        17336.4688,
+        18172.2845,
+        19042.2163,
+        19947.3825,
+        20888.9276,
+        21868.0229,
+        22885.8666,
+        23943.6844,
+        25042.7295,
+        26184.2831,
+        27369.6544,
+        28600.1815,
+        29877.2309,
+        31202.1985,
+        32576.5094,
+        34001.6183,
+        35479.01,
+        37010.1992,
+        38596.7314,
+        40240.1825,
+        41942.1594,
+        43704.3004,
+        45528.2749,
+        47415.7843,
+        49368.5617,
+        51388.3725,
+        53477.0144,
+        55636.3176,
+        57868.1451,
+    ),
+)
+
+# natural log of the relative humidity (as a fraction) every LN_RH_STEP from
+# LN_RH_MIN to LN_RH_MAX percent
+LN_RH_MIN = 10
+LN_RH_MAX = 100
+LN_RH_STEP = 1
+LN_RH = array(
+    "f",
+    (
+        -2.3025851,
+        -2.2072749,
+        -2.1202635,
+        -2.0402208,
+        -1.9661129,
+        -1.89712,
+        -1.8325815,
+        -1.7719568,
+        -1.7147984,
+        -1.6607312,
+        -1.6094379,
+        -1.5606477,
+        -1.5141277,
+        -1.469676,
+        -1.4271164,
+        -1.3862944,
+        -1.3470736,
+        -1.3093333,
+        -1.2729657,
+        -1.2378744,
+        -1.2039728,
+        -1.171183,
+        -1.1394343,
+        -1.1086626,
+        -1.0788097,
+        -1.0498221,
+        -1.0216512,
+        -0.9942523,
+        -0.967584,
+        -0.9416085,
+        -0.9162907,
+        -0.8915981,
+        -0.8675006,
+        -0.8439701,
+        -0.8209806,
+        -0.7985077,
+        -0.7765288,
+        -0.7550226,
+        -0.7339692,
+        -0.7133499,
+        -0.6931472,
+        -0.6733446,
+        -0.6539265,
+        -0.6348783,
+        -0.6161861,
+        -0.597837,
+        -0.5798185,
+        -0.5621189,
+        -0.5447272,
+        -0.5276327,
+        -0.5108256,
+        -0.4942963,
+        -0.4780358,
+        -0.4620355,
+        -0.4462871,
+        -0.4307829,
+        -0.4155154,
+        -0.4004776,
+        -0.3856625,
+        -0.3710637,
+        -0.3566749,
+        -0.3424903,
+        -0.3285041,
+        -0.3147107,
+        -0.3011051,
+        -0.2876821,
+        -0.2744368,
+        -0.2613648,
+        -0.2484614,
+        -0.2357223,
+        -0.2231436,
+        -0.210721,
+        -0.1984509,
+        -0.1863296,
+        -0.1743534,
+        -0.1625189,
+        -0.1508229,
+        -0.1392621,
+        -0.1278334,
+        -0.1165338,
+        -0.1053605,
+        -0.0943107,
+        -0.0833816,
+        -0.0725707,
+        -0.0618754,
+        -0.0512933,
+        -0.040822,
+        -0.0304592,
+        -0.0202027,
+        -0.0100503,
+        0.0,
+    ),
+)
@@ -0,0 +1,261 @@
+import time, ustruct, ujson, ubinascii
+import enviro.helpers as helpers
+from phew import logging
+
+# compact binary encoding of cached upload payloads
+#
+# the nickname, model, uid and reading names are the same for almost every
+# reading so they are stored once in a schema table and each record only
+# refers to its schema by id. a record is:
+#
+#   uint8   format version (RECORD_VERSION)
+#   uint8   schema id
+#   uint32  timestamp (seconds since the epoch)
+#   int8    wifi rssi (WIFI_NONE if unknown)
+#   uint32  sequence number
+#   uint16  fingerprint of the schema (see _fingerprint())
+#   int32   one fixed point value per reading in the schema (VALUE_NONE if None)
+#   ...     any other payload fields as json (optional)
+#
+# if the schema table is lost its ids are handed out again from 0, the
+# fingerprint stops a record from being decoded with a different schema that
+# has since been given its id. version 2 records have no fingerprint and
+# version 1 records (written before sequence numbers were added) have no
+# sequence number either, they are only decoded with schemas made before
+# fingerprints were added. json encoded payloads always start with "{" so all
+# of them can live side by side
+RECORD_VERSION = 3
+RECORD_HEADER = "<BBIbIH"
+RECORD_HEADER_SIZE = 13
+RECORD_HEADER_V2 = "<BBIbI"
+RECORD_HEADER_V2_SIZE = 11
+RECORD_HEADER_V1 = "<BBIb"
+RECORD_HEADER_V1_SIZE = 7
+SCHEMA_FILE = "upload_schemas.json"  # with a backup in upload_schemas.json.bak
+MAX_SCHEMAS = 255
+
+WIFI_NONE = -128
+VALUE_NONE = -2147483648
+VALUE_MAX = 2147483647
+
+# how many decimal places of each float reading are kept, anything not listed
+# keeps DEFAULT_DECIMAL_PLACES. integer readings are always stored exactly
+DEFAULT_DECIMAL_PLACES = 2
+DECIMAL_PLACES = {
+    "aqi": 1,
+    "battery_voltage": 3,
+    "noise": 3,
+    "rain": 4,
+    "rain_per_hour": 4,
+    "rain_per_second": 6,
+    "rain_today": 3,
+    "uv_index": 4,
+    "wind_direction_confidence": 3,
+}
+
+# payload fields that are part of the record header or schema
+PAYLOAD_FIELDS = ("nickname", "timestamp", "readings", "model", "uid", "wifi", "seq")
+
+_schemas = None
+
+
+def _load_schemas():
+    global _schemas
+    if _schemas is None:
+        try:
+            _schemas = helpers.load_json_with_backup(SCHEMA_FILE)
+        except OSError:
+            _schemas = []
+        except ValueError:
+            # records cached with the lost schemas can no longer be decoded
+            logging.error(f"  ! upload schema table is damaged, starting a new one")
+            _schemas = []
+    return _schemas
+
+
+def _save_schemas():
+    helpers.save_json_with_backup(SCHEMA_FILE, _schemas)
+
+
+def _fingerprint(schema):
+    text = "|".join(
+        (
+            schema["nickname"],
+            schema["model"],
+            schema["uid"],
+            ",".join(schema["keys"]),
+            ",".join(str(places) for places in schema["places"]),
+        )
+    )
+    return ubinascii.crc32(text.encode("utf-8")) & 0xFFFF
+
+
+# decimal places used to store a value, 0 for integers and None for values
+# that can't be stored as a fixed point number
+def _decimal_places(key, value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return 0
+    if isinstance(value, float):
+        return DECIMAL_PLACES.get(key, DEFAULT_DECIMAL_PLACES)
+    return None
+
+
+def _schema_id(payload, keys, places):
+    schemas = _load_schemas()
+    schema = {
+        "nickname": payload["nickname"],
+        "model": payload["model"],
+        "uid": payload["uid"],
+        "keys": keys,
+        "places": places,
+        "version": RECORD_VERSION,
+    }
+    for schema_id, existing in enumerate(schemas):
+        if existing == schema:
+            return schema_id
+
+    if len(schemas) >= MAX_SCHEMAS:
+        return None
+
+    schemas.append(schema)
+    _save_schemas()
+    return len(schemas) - 1
+
+
+def _datetime_string(timestamp):
+    dt = time.localtime(timestamp)
+    return "{0:04d}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:02d}Z".format(*dt)
+
+
+# returns the payload as a compact binary record, or as json if it contains
+# something that the binary format can't hold
+def encode(payload):
+    readings = payload["readings"]
+    keys = []
+    places = []
+    values = []
+    for key, value in readings.items():
+        keys.append(key)
+        if value is None:
+            # None doesn't tell us what type the reading is, treat it as a float
+            places.append(_decimal_places(key, 0.0))
+            values.append(VALUE_NONE)
+            continue
+
+        decimal_places = _decimal_places(key, value)
+        if decimal_places is None:
+            return ujson.dumps(payload)
+
+        value = round(value * 10**decimal_places)
+        if value <= VALUE_NONE or value > VALUE_MAX:
+            return ujson.dumps(payload)
+
+        places.append(decimal_places)
+        values.append(value)
+
+    wifi = payload.get("wifi")
+    if wifi is None:
+        wifi = WIFI_NONE
+    elif not isinstance(wifi, int) or wifi <= WIFI_NONE or wifi > 127:
+        return ujson.dumps(payload)
+
+    seq = payload.get("seq")
+    if not isinstance(seq, int) or seq < 0 or seq > 0xFFFFFFFF:
+        return ujson.dumps(payload)
+
+    schema_id = _schema_id(payload, keys, places)
+    if schema_id is None:
+        logging.warn(f"  - upload schema table is full, caching reading as json")
+        return ujson.dumps(payload)
+
+    fingerprint = _fingerprint(_schemas[schema_id])
+    timestamp = helpers.timestamp(payload["timestamp"])
+    record = bytearray(
+        ustruct.pack(
+            RECORD_HEADER,
+            RECORD_VERSION,
+            schema_id,
+            timestamp,
+            wifi,
+            seq,
+            fingerprint,
+        )
+    )
+    record.extend(ustruct.pack(f"<{len(values)}i", *values))
+
+    extras = {}
+    for key, value in payload.items():
+        if key not in PAYLOAD_FIELDS:
+            extras[key] = value
+    if extras:
+        record.extend(ujson.dumps(extras).encode("utf-8"))
+
+    return bytes(record)
+
+
+# turns a cached record (binary or json) back into an upload payload dict
+def decode(record):
+    if not record:
+        raise ValueError("empty record")
+
+    seq = None
+    fingerprint = None
+    if record[0] == RECORD_VERSION:
+        header_size = RECORD_HEADER_SIZE
+        _, schema_id, timestamp, wifi, seq, fingerprint = ustruct.unpack_from(
+            RECORD_HEADER, record
+        )
+    elif record[0] == 2:
+        header_size = RECORD_HEADER_V2_SIZE
+        _, schema_id, timestamp, wifi, seq = ustruct.unpack_from(
+            RECORD_HEADER_V2, record
+        )
+    elif record[0] == 1:
+        header_size = RECORD_HEADER_V1_SIZE
+        _, schema_id, timestamp, wifi = ustruct.unpack_from(RECORD_HEADER_V1, record)
+    else:
+        return ujson.loads(record)
+
+    schemas = _load_schemas()
+    if schema_id >= len(schemas):
+        raise ValueError("unknown upload schema")
+    schema = schemas[schema_id]
+    if fingerprint is None:
+        if "version" in schema:
+            raise ValueError("upload schema has been replaced")
+    elif fingerprint != _fingerprint(schema):
+        raise ValueError("upload schema has been replaced")
+
+    keys = schema["keys"]
+    places = schema["places"]
+    values = ustruct.unpack_from(f"<{len(keys)}i", record, header_size)
+
+    from ucollections import OrderedDict
+
+    readings = OrderedDict()
+    for key, decimal_places, value in zip(keys, places, values):
+        if value == VALUE_NONE:
+            readings[key] = None
+        elif decimal_places == 0:
+            readings[key] = value
+        else:
+            readings[key] = round(value / 10**decimal_places, decimal_places)
+
+    payload = {
+        "nickname": schema["nickname"],
+        "timestamp": _datetime_string(timestamp),
+        "readings": readings,
+        "model": schema["model"],
+        "uid": schema["uid"],
+        "wifi": None if wifi == WIFI_NONE else wifi,
+    }
+    if seq is not None:
+        payload["seq"] = seq
+
+    extras = record[header_size + 4 * len(keys) :]
+    if extras:
+        payload.update(ujson.loads(extras))
+
+    return payload
@@ -0,0 +1,81 @@
+# rolling window statistics
+#
+# min, max and mean of a value over the last n buckets (for example the last
+# 24 hours in hourly buckets) without keeping every sample. each window is a
+# small dict that can be saved as json between wakes:
+#
+#   "b"   the current bucket: [bucket number, min, max, sum, count]
+#   "s"   [bucket number, sum, count] of each complete bucket in the window
+#   "lo"  [bucket number, min] of complete buckets with rising mins, the first
+#         is the lowest in the window (a monotonic deque)
+#   "hi"  [bucket number, max] of complete buckets with falling maxes, the
+#         first is the highest in the window
+#   "sum", "n"  totals of the complete buckets in the window
+#
+# adding a value and reading the result are O(1) amortised, nothing is ever
+# rescanned.
+
+
+def _close_bucket(window):
+    number, low, high, total, count = window["b"]
+
+    lo = window.setdefault("lo", [])
+    while lo and lo[-1][1] >= low:
+        lo.pop()
+    lo.append([number, low])
+
+    hi = window.setdefault("hi", [])
+    while hi and hi[-1][1] <= high:
+        hi.pop()
+    hi.append([number, high])
+
+    window.setdefault("s", []).append([number, total, count])
+    window["sum"] = window.get("sum", 0.0) + total
+    window["n"] = window.get("n", 0) + count
+
+
+# drop complete buckets older than first
+def _expire(window, first):
+    buckets = window.get("s", [])
+    while buckets and buckets[0][0] < first:
+        _, total, count = buckets.pop(0)
+        window["sum"] -= total
+        window["n"] -= count
+    for key in ("lo", "hi"):
+        entries = window.get(key, [])
+        while entries and entries[0][0] < first:
+            entries.pop(0)
+
+
+# add value seen at epoch now to a window of buckets * bucket_seconds
+def update(window, value, now, bucket_seconds, buckets):
+    number = now // bucket_seconds
+    current = window.get("b")
+    if current and current[0] != number:
+        _close_bucket(window)
+        current = None
+
+    if current:
+        current[1] = min(current[1], value)
+        current[2] = max(current[2], value)
+        current[3] += value
+        current[4] += 1
+    else:
+        window["b"] = [number, value, value, value, 1]
+
+    _expire(window, number - buckets + 1)
+
+
+# (min, max, mean) over the window, None if nothing has been added
+def result(window):
+    current = window.get("b")
+    if not current:
+        return None
+
+    low, high = current[1], current[2]
+    if window.get("lo"):
+        low = min(low, window["lo"][0][1])
+    if window.get("hi"):
+        high = max(high, window["hi"][0][1])
+    mean = (window.get("sum", 0.0) + current[3]) / (window.get("n", 0) + current[4])
+    return low, high, mean
@@ -0,0 +1,98 @@
+import time
+import enviro.helpers as helpers
+from phew import logging
+import config
+
+# network timing telemetry
+#
+# the wifi connection and uploads record how long each phase of getting data
+# off the device took (and how many bytes were sent and received) while awake,
+# save() then adds them to a short history of upload sessions kept in
+# TELEMETRY_FILE. with config.network_telemetry enabled a summary of that
+# history is attached to each reading so it can be looked at on the server.
+#
+# phases:
+#   associate  joining the wifi network
+#   dhcp       getting an ip address once joined
+#   dns        looking up the destination's address
+#   connect    opening the tcp connection
+#   tls        the tls handshake (https / mqtts)
+#   send       writing requests
+#   ack        waiting for responses
+#   upload     total time spent uploading to the destinations
+TELEMETRY_FILE = "telemetry.json"
+HISTORY_LENGTH = 8
+
+_session = None
+_history = None
+
+
+def _current():
+    global _session
+    if _session is None:
+        _session = {"tx": 0, "rx": 0}
+    return _session
+
+
+def _load_history():
+    global _history
+    if _history is None:
+        try:
+            _history = helpers.load_json(TELEMETRY_FILE)
+        except (OSError, ValueError):
+            _history = []
+    return _history
+
+
+# add elapsed_ms to the time spent in a phase
+def record(phase, elapsed_ms):
+    session = _current()
+    session[phase] = session.get(phase, 0) + elapsed_ms
+
+
+# record the time since started_ms (from time.ticks_ms()) against a phase
+def record_since(phase, started_ms):
+    record(phase, time.ticks_diff(time.ticks_ms(), started_ms))
+
+
+def record_bytes(sent=0, received=0):
+    session = _current()
+    session["tx"] += sent
+    session["rx"] += received
+
+
+# add what was recorded while awake to the history, oldest sessions drop off
+# once there are more than HISTORY_LENGTH
+def save():
+    global _session
+    if _session is None or not config.network_telemetry:
+        return
+
+    history = _load_history()
+    history.append(_session)
+    if len(history) > HISTORY_LENGTH:
+        del history[: len(history) - HISTORY_LENGTH]
+    _session = None
+
+    try:
+        helpers.save_json(TELEMETRY_FILE, history)
+    except OSError:
+        logging.error(f"  ! failed to save network telemetry")
+
+
+# average of each phase (ms) and byte count over the sessions in the history,
+# plus the number of sessions ("n"). None if there is no history yet
+def summary():
+    history = _load_history()
+    if not history:
+        return None
+
+    totals = {}
+    for session in history:
+        for key, value in session.items():
+            totals[key] = totals.get(key, 0) + value
+
+    result = {"n": len(history)}
+    for key, value in totals.items():
+        result[key] = round(value / len(history))
+    return result
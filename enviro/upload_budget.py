@@ -0,0 +1,40 @@
+import time
+import config
+
+# upload budget
+#
+# after an outage the backlog of cached readings can keep the wifi on for a
+# long time, config.upload_time_budget (seconds) and config.upload_byte_budget
+# limit how much of it is uploaded to each destination per wake. whatever is
+# left stays cached and is picked up from the same place on the next wake.
+# bytes are counted as the readings are stored in the upload cache
+
+# destination: [time the upload has to stop by (ticks_ms), bytes it may still
+# send], either None if there is no limit
+_budgets = {}
+
+
+def start(destination):
+    deadline_ms = None
+    if config.upload_time_budget:
+        deadline_ms = time.ticks_add(
+            time.ticks_ms(), int(config.upload_time_budget * 1000)
+        )
+    _budgets[destination] = [deadline_ms, config.upload_byte_budget or None]
+
+
+# count bytes of readings sent to the destination against its budget
+def spend(destination, size):
+    budget = _budgets.get(destination)
+    if budget is not None and budget[1] is not None:
+        budget[1] -= size
+
+
+def exhausted(destination):
+    budget = _budgets.get(destination)
+    if budget is None:
+        return False
+    deadline_ms, bytes_left = budget
+    if deadline_ms is not None and time.ticks_diff(deadline_ms, time.ticks_ms()) <= 0:
+        return True
+    return bytes_left is not None and bytes_left <= 0
@@ -0,0 +1,126 @@
+import enviro.helpers as helpers
+from phew import logging
+import config
+
+# adaptive upload cadence
+#
+# connecting to wifi is the most expensive thing enviro does so when
+# config.adaptive_upload is enabled the number of readings cached before an
+# upload is scaled from config.upload_frequency using what has been seen on
+# previous wakes: how long wifi took to connect, the signal strength, how
+# often uploads succeed and the battery level. slow, weak or unreliable links
+# and low batteries batch more readings per connection, the result is kept
+# between config.upload_frequency_min and config.upload_frequency_max.
+POLICY_FILE = "upload_policy.json"
+
+# weight given to the newest sample in the running averages
+SMOOTHING = 0.3
+
+# typical wifi connect time, connections slower than this batch more
+NOMINAL_CONNECT_MS = 3000
+
+WEAK_RSSI = -75
+STRONG_RSSI = -60
+LOW_BATTERY_PERCENT = 20
+POOR_SUCCESS_RATE = 0.5
+
+_state = None
+# set when _state has changes that commit() hasn't written yet
+_dirty = False
+
+
+def _load_state():
+    global _state
+    if _state is None:
+        try:
+            _state = helpers.load_json(POLICY_FILE)
+        except (OSError, ValueError):
+            _state = {}
+    return _state
+
+
+# the state is only kept up to date while config.adaptive_upload is enabled
+# and only written once per wake (see commit())
+def commit():
+    global _dirty
+    if not _dirty:
+        return
+    try:
+        helpers.save_json(POLICY_FILE, _state)
+        _dirty = False
+    except OSError as e:
+        logging.error(f"  ! failed to save upload policy: {e}")
+
+
+def _smooth(key, value):
+    global _dirty
+    state = _load_state()
+    previous = state.get(key)
+    if previous is None:
+        state[key] = value
+    else:
+        state[key] = previous + SMOOTHING * (value - previous)
+    _dirty = True
+
+
+# record how long it took to connect to wifi
+def record_connect(elapsed_ms):
+    if config.adaptive_upload:
+        _smooth("connect_ms", elapsed_ms)
+
+
+# record the signal strength and battery level seen when taking a reading
+def record_reading(rssi, battery_percent):
+    global _dirty
+    if not config.adaptive_upload:
+        return
+    if rssi is not None:
+        _smooth("rssi", rssi)
+    if battery_percent is not None:
+        _load_state()["battery_percent"] = battery_percent
+        _dirty = True
+
+
+# record whether an upload attempt succeeded
+def record_upload(success):
+    if config.adaptive_upload:
+        _smooth("success_rate", 1.0 if success else 0.0)
+
+
+# number of cached readings that should trigger an upload
+def upload_threshold(usb_powered):
+    if not config.adaptive_upload:
+        return config.upload_frequency
+
+    # power is free on usb so upload every reading
+    if usb_powered:
+        return 1
+
+    state = _load_state()
+    factor = 1.0
+
+    connect_ms = state.get("connect_ms")
+    if connect_ms is not None:
+        factor *= max(0.5, min(3.0, connect_ms / NOMINAL_CONNECT_MS))
+
+    rssi = state.get("rssi")
+    if rssi is not None:
+        if rssi < WEAK_RSSI:
+            factor *= 1.5
+        elif rssi > STRONG_RSSI:
+            factor *= 0.75
+
+    success_rate = state.get("success_rate")
+    if success_rate is not None and success_rate < POOR_SUCCESS_RATE:
+        factor *= 2.0
+
+    battery_percent = state.get("battery_percent")
+    if battery_percent is not None and battery_percent < LOW_BATTERY_PERCENT:
+        factor *= 2.0
+
+    threshold = round(config.upload_frequency * factor)
+    threshold = max(
+        config.upload_frequency_min, min(config.upload_frequency_max, threshold)
+    )
+    logging.debug(f"  - adaptive upload threshold {threshold} (x{factor:.2f})")
+    return threshold
@@ -0,0 +1,86 @@
+# lib/fast_wake.py
+#
+# a rain gauge tip wakes enviro weather only so that the tip can be counted.
+# rather than going through the whole of the enviro startup (i2c scan, rtc
+# setup, config checks, etc.) the time of the tip is appended to
+# RAIN_TIPS_FILE and the board turns itself straight back off again. the
+# weather board adds these tips to its daily stats on its next full wake.
+#
+# this runs before enviro is imported so can't use anything from it, the pins
+# below are copied from enviro/constants.py
+import os, time, ustruct
+from machine import Pin, I2C
+
+HOLD_VSYS_EN_PIN = 2
+I2C_SDA_PIN = 4
+I2C_SCL_PIN = 5
+BUTTON_PIN = 7
+RTC_ALARM_PIN = 8
+RAIN_PIN = 10
+I2C_ADDR_PCF85063A = 0x51
+
+RAIN_TIPS_FILE = "rain_tips.bin"
+# only written by the weather board, so if it's missing this isn't one (or it
+# hasn't been set up yet)
+DAILY_STATS_FILE = "daily_stats.json"
+
+# the board stays powered while the rain gauge switch is closed, if it is
+# still on after this long carry on with a normal startup instead
+POWER_OFF_TIMEOUT_MS = 2000
+
+# set once the tip that woke the board has been saved
+recorded = False
+
+
+def _bcd(value):
+    return (value >> 4) * 10 + (value & 0x0F)
+
+
+# current time from the pcf85063a in seconds since the epoch
+def _rtc_time():
+    i2c = I2C(0, sda=Pin(I2C_SDA_PIN), scl=Pin(I2C_SCL_PIN), freq=100000)
+    data = i2c.readfrom_mem(I2C_ADDR_PCF85063A, 0x04, 7)
+    return time.mktime(
+        (
+            _bcd(data[6]) + 2000,
+            _bcd(data[5] & 0x1F),
+            _bcd(data[3] & 0x3F),
+            _bcd(data[2] & 0x3F),
+            _bcd(data[1] & 0x7F),
+            _bcd(data[0] & 0x7F),
+            0,
+            0,
+        )
+    )
+
+
+# if only the rain gauge woke the board save the tip and turn off, returns if
+# the normal startup should go ahead
+def rain_tip():
+    global recorded
+    import wakeup
+
+    state = wakeup.get_gpio_state()
+    if not state & (1 << RAIN_PIN):
+        return
+    if state & ((1 << BUTTON_PIN) | (1 << RTC_ALARM_PIN)):
+        return
+
+    try:
+        os.stat(DAILY_STATS_FILE)
+    except OSError:
+        return
+
+    hold_vsys_en_pin = Pin(HOLD_VSYS_EN_PIN, Pin.OUT, value=True)
+    try:
+        tip_time = _rtc_time()
+        with open(RAIN_TIPS_FILE, "ab") as f:
+            f.write(ustruct.pack("<I", tip_time))
+    except OSError:
+        return
+    recorded = True
+
+    # turn off
+    hold_vsys_en_pin.init(Pin.IN)
+    time.sleep_ms(POWER_OFF_TIMEOUT_MS)
+    hold_vsys_en_pin.init(Pin.OUT, value=True)
@@ -153,9 +153,7 @@ def check_and_update(current_version="0.0.0"):
                     new_lines.append(line)
 
             # Write lines back to file (MicroPython-safe)
-            with open("config.py", "w") as f:
-                for line in new_lines:
-                    f.write(line)
+            _safe_write("config.py", "".join(new_lines).encode())
 
             logging.info("  - OTA hass_discovery_triggered updated to False")
         except:
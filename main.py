@@ -23,6 +23,12 @@
 # from phew import logging
 # logging.disable_logging_types(logging.LOG_DEBUG)
 
+# if a rain gauge tip woke the board just count it and turn off again, this
+# returns if the normal startup is needed
+import lib.fast_wake as fast_wake
+
+fast_wake.rain_tip()
+
 # Issue #117 where neeed to sleep on startup otherwis emight not boot
 from time import sleep
 
@@ -57,10 +63,21 @@ try:
 
             # if we have enough cached uploads...
             enviro.logging.info(
-                f"> {enviro.cached_upload_count()} cache file(s) need uploading"
+                f"> {enviro.cached_upload_count()} cached reading(s) need uploading"
             )
-            if not enviro.upload_readings():
-                enviro.halt("! reading upload failed")
+            # the disk can still be full after a successful upload if a
+            # failing secondary destination is holding on to readings
+            uploaded = enviro.upload_readings()
+            if not uploaded or enviro.low_disk_space():
+                # rather than stopping, make room for new readings by merging
+                # the oldest cached ones together
+                if enviro.downsample_cached_readings():
+                    enviro.logging.error(
+                        "! low disk space, dropped or merged older readings to free space"
+                    )
+                    enviro.warn_led(enviro.WARN_LED_BLINK)
+                elif not uploaded:
+                    enviro.halt("! reading upload failed")
         else:
             # no destination so go to sleep
             enviro.halt("! low disk space")
@@ -106,6 +123,9 @@ try:
     #
     #   readings["custom"] = my_reading()  # add my custom reading value
 
+    # keep hourly and daily summaries of the readings on the device
+    enviro.archive_reading(reading)
+
     # is an upload destination set?
     if enviro.config.destination:
         # if so cache this reading for upload later
@@ -115,13 +135,13 @@ try:
         # if we have enough cached uploads...
         if enviro.is_upload_needed():
             enviro.logging.info(
-                f"> {enviro.cached_upload_count()} cache file(s) need uploading"
+                f"> {enviro.cached_upload_count()} cached reading(s) need uploading"
             )
             if not enviro.upload_readings():
                 enviro.halt("! reading upload failed")
         else:
             enviro.logging.info(
-                f"> {enviro.cached_upload_count()} cache file(s) not being uploaded. Waiting until there are {enviro.config.upload_frequency} file(s)"
+                f"> {enviro.cached_upload_count()} cached reading(s) not being uploaded. Waiting until there are {enviro.upload_threshold()} reading(s)"
             )
     else:
         # otherwise save reading to local csv file (look in "/readings")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# builds enviro/psychrometric_tables.py, the lookup tables used by the
+# saturation vapour pressure and dewpoint functions in enviro/helpers.py, and
+# checks the interpolated values against the exact formulas
+#
+#   python3 tools/psychrometric_tables.py          build the tables and check
+#   python3 tools/psychrometric_tables.py --check  only check
+#
+# the exact formulas are taken from enviro/helpers.py itself (helpers can't be
+# imported off the device) so that the tables always match them
+import ast, math, sys
+
+HELPERS_PATH = "enviro/helpers.py"
+CONSTANTS_PATH = "enviro/constants.py"
+TABLES_PATH = "enviro/psychrometric_tables.py"
+
+# the bme280 / bme688 operating range
+SVP_MIN_C = -40
+SVP_MAX_C = 85
+SVP_STEP_C = 1
+
+# below this relative humidity the exact logarithm is used
+LN_RH_MIN = 10
+LN_RH_MAX = 100
+LN_RH_STEP = 1
+
+# largest allowed error of the interpolated values, well inside the sensors'
+# own accuracy (+-3%rh, +-1C)
+SVP_MAX_RELATIVE_ERROR = 0.0015
+DEWPOINT_MAX_ERROR = 0.05
+
+EXACT_FUNCTIONS = (
+    "get_saturation_vapor_pressure_exact",
+    "calculate_dewpoint_exact",
+    "celcius_to_kelvin",
+)
+TABLE_FUNCTIONS = (
+    "get_saturation_vapor_pressure",
+    "calculate_dewpoint",
+    "_ln_relative_humidity",
+)
+
+
+def load_functions(names, namespace):
+    with open(HELPERS_PATH) as f:
+        tree = ast.parse(f.read())
+    found = [
+        node
+        for node in tree.body
+        if isinstance(node, ast.FunctionDef) and node.name in names
+    ]
+    module = ast.Module(body=found, type_ignores=[])
+    exec(compile(module, HELPERS_PATH, "exec"), namespace)
+    return namespace
+
+
+def load_file(path):
+    namespace = {}
+    with open(path) as f:
+        exec(f.read(), namespace)
+    return namespace
+
+
+def format_table(values):
+    lines = []
+    for i in range(0, len(values), 6):
+        lines.append("        " + ", ".join(f"{v!r}" for v in values[i : i + 6]) + ",")
+    return "\n".join(lines)
+
+
+def build(exact):
+    svp = [
+        exact["get_saturation_vapor_pressure_exact"](c + 273.15)
+        for c in range(SVP_MIN_C, SVP_MAX_C + 1, SVP_STEP_C)
+    ]
+    ln_rh = [math.log(rh / 100) for rh in range(LN_RH_MIN, LN_RH_MAX + 1, LN_RH_STEP)]
+
+    with open(TABLES_PATH, "w") as f:
+        f.write(f"""# generated by tools/psychrometric_tables.py, do not edit
+from array import array
+
+# saturation vapour pressure (Pa) every SVP_STEP_C from SVP_MIN_C to SVP_MAX_C
+SVP_MIN_C = {SVP_MIN_C}
+SVP_MAX_C = {SVP_MAX_C}
+SVP_STEP_C = {SVP_STEP_C}
+SVP = array(
+    "f",
+    (
+{format_table([round(v, 4) for v in svp])}
+    ),
+)
+
+# natural log of the relative humidity (as a fraction) every LN_RH_STEP from
+# LN_RH_MIN to LN_RH_MAX percent
+LN_RH_MIN = {LN_RH_MIN}
+LN_RH_MAX = {LN_RH_MAX}
+LN_RH_STEP = {LN_RH_STEP}
+LN_RH = array(
+    "f",
+    (
+{format_table([round(v, 7) for v in ln_rh])}
+    ),
+)
+""")
+    print(f"wrote {TABLES_PATH} ({len(svp)} + {len(ln_rh)} values)")
+
+
+def check(exact):
+    namespace = dict(exact)
+    namespace["math"] = math
+    namespace["psychrometric_tables"] = type(sys)("psychrometric_tables")
+    namespace["psychrometric_tables"].__dict__.update(load_file(TABLES_PATH))
+    table = load_functions(TABLE_FUNCTIONS, namespace)
+
+    svp_error = 0
+    for step in range((SVP_MAX_C - SVP_MIN_C) * 100 + 1):
+        k = SVP_MIN_C + step / 100 + 273.15
+        expected = exact["get_saturation_vapor_pressure_exact"](k)
+        error = abs(table["get_saturation_vapor_pressure"](k) - expected) / expected
+        svp_error = max(svp_error, error)
+
+    dewpoint_error = 0
+    for t in range((SVP_MAX_C - SVP_MIN_C) * 2 + 1):
+        c = SVP_MIN_C + t / 2
+        for rh in range(1, 1001):
+            h = rh / 10
+            expected = exact["calculate_dewpoint_exact"](c, h)
+            error = abs(table["calculate_dewpoint"](c, h) - expected)
+            dewpoint_error = max(dewpoint_error, error)
+
+    print(f"saturation vapour pressure max relative error {svp_error:.6f}")
+    print(f"dewpoint max error {dewpoint_error:.4f}C")
+    ok = svp_error <= SVP_MAX_RELATIVE_ERROR and dewpoint_error <= DEWPOINT_MAX_ERROR
+    print("ok" if ok else "tables are not accurate enough")
+    return ok
+
+
+def main():
+    exact = load_file(CONSTANTS_PATH)
+    exact["math"] = math
+    load_functions(EXACT_FUNCTIONS, exact)
+
+    if "--check" not in sys.argv:
+        build(exact)
+    if not check(exact):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
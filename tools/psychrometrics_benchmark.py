@@ -0,0 +1,44 @@
+# times the table driven dewpoint and saturation vapour pressure functions in
+# enviro/helpers.py against the exact formulas, run it on the board with enviro
+# installed:
+#
+#   mpremote run tools/psychrometrics_benchmark.py
+import time
+import enviro.helpers as helpers
+
+ITERATIONS = 2000
+
+
+def benchmark(function, arguments):
+    start = time.ticks_us()
+    for temperature, humidity in arguments:
+        function(temperature, humidity)
+    return time.ticks_diff(time.ticks_us(), start) / len(arguments)
+
+
+def compare(name, table, exact, arguments):
+    table_us = benchmark(table, arguments)
+    exact_us = benchmark(exact, arguments)
+    print(
+        f"{name}: table {table_us:.1f}us, exact {exact_us:.1f}us, exact / table {exact_us / table_us:.2f}"
+    )
+
+
+# spread the samples over the range the sensors report
+dewpoint_arguments = [
+    (-20 + (i % 70) * 0.9, 15 + (i % 85) * 0.97) for i in range(ITERATIONS)
+]
+svp_arguments = [(helpers.celcius_to_kelvin(t), None) for t, _ in dewpoint_arguments]
+
+compare(
+    "calculate_dewpoint",
+    helpers.calculate_dewpoint,
+    helpers.calculate_dewpoint_exact,
+    dewpoint_arguments,
+)
+compare(
+    "get_saturation_vapor_pressure",
+    lambda k, _: helpers.get_saturation_vapor_pressure(k),
+    lambda k, _: helpers.get_saturation_vapor_pressure_exact(k),
+    svp_arguments,
+)